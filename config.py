@@ -56,6 +56,14 @@ MINIO_DATA_SOURCE_UPDATE_DATES_FILE = "data_source_updates.json"
 # Insee
 INSEE_SECRET_BEARER = Variable.get("SECRET_BEARER_INSEE", None)
 INSEE_API_URL = "https://api.insee.fr/api-sirene/3.11/"
+# The departement files of the établissement stock are downloaded and parsed by
+# this many threads, in chunks of rows, while the previous ones are inserted
+ETABLISSEMENT_STOCK_THREAD_COUNT = int(
+    Variable.get("ETABLISSEMENT_STOCK_THREAD_COUNT", 4)
+)
+ETABLISSEMENT_STOCK_CHUNK_SIZE = int(
+    Variable.get("ETABLISSEMENT_STOCK_CHUNK_SIZE", 100000)
+)
 
 # Notification
 TCHAP_ANNUAIRE_WEBHOOK = Variable.get("TCHAP_ANNUAIRE_WEBHOOK", "")
@@ -93,23 +101,81 @@ REDIS_HOST = Variable.get("REDIS_HOST", "redis")
 REDIS_PORT = Variable.get("REDIS_PORT", "6379")
 REDIS_DB = Variable.get("REDIS_DB", "0")
 REDIS_PASSWORD = Variable.get("REDIS_PASSWORD", None)
+# Cache key contract with the API: the API reads the value of this key, the name of
+# the live index (e.g. "siren-20240208001729"), and prefixes each of its cache keys
+# with "{value}:", so that a new index starts a new cache namespace
+REDIS_CACHE_VERSION_KEY = Variable.get("REDIS_CACHE_VERSION_KEY", "cache_version")
+# Set to True once the API is known to follow this contract. Until then, every key
+# outside the namespace of the new index is deleted when the index changes
+REDIS_CACHE_IS_NAMESPACED = Variable.get(
+    "REDIS_CACHE_IS_NAMESPACED", "False"
+).lower() not in ["false", "0"]
+# Seconds before the keys of the previous namespace expire, 0 to delete them at once
+REDIS_PREVIOUS_CACHE_TTL = int(Variable.get("REDIS_PREVIOUS_CACHE_TTL", 0))
 
 # ElasticSearch
 ELASTIC_PASSWORD = Variable.get("ELASTIC_PASSWORD", None)
 ELASTIC_URL = Variable.get("ELASTIC_URL", None)
 ELASTIC_USER = Variable.get("ELASTIC_USER", None)
 ELASTIC_BULK_THREAD_COUNT = int(Variable.get("ELASTIC_BULK_THREAD_COUNT", 4))
+ELASTIC_INDEXING_WORKER_COUNT = int(Variable.get("ELASTIC_INDEXING_WORKER_COUNT", 4))
 ELASTIC_BULK_SIZE = int(Variable.get("ELASTIC_BULK_SIZE", 1500))
-ELASTIC_SHARDS = 2
+# Maximum size in bytes of a bulk request, whatever its number of documents
+ELASTIC_BULK_MAX_CHUNK_BYTES = int(
+    Variable.get("ELASTIC_BULK_MAX_CHUNK_BYTES", 10 * 1024 * 1024)
+)
+# "full" rebuilds every document in a new index, "delta" clones the live index and
+# only updates the sirens changed since its last indexing
+ELASTIC_INDEXING_MODE = Variable.get("ELASTIC_INDEXING_MODE", "full")
+# Layout of a new index: number of shards, index sort ({field: "asc" or "desc"},
+# {} for none) and codec ("default" or "best_compression")
+ELASTIC_SHARDS = int(Variable.get("ELASTIC_SHARDS", 2))
+ELASTIC_INDEX_SORT = json.loads(
+    Variable.get(
+        "ELASTIC_INDEX_SORT", '{"unite_legale.facteur_taille_entreprise": "desc"}'
+    )
+)
+ELASTIC_INDEX_CODEC = Variable.get("ELASTIC_INDEX_CODEC", "default")
+# Number of segments per shard of a loaded index
+ELASTIC_FORCE_MERGE_MAX_SEGMENTS = int(
+    Variable.get("ELASTIC_FORCE_MERGE_MAX_SEGMENTS", 1)
+)
 ELASTIC_REPLICAS = 0
 
 ELASTIC_MAX_LIVE_VERSIONS = int(Variable.get("ELASTIC_MAX_LIVE_VERSIONS", 2))
 
+# Search API queries (e.g. "q=rue&page=1") replayed with the slow requests to warm
+# up a new index, until they all take less than the budget (milliseconds). They are
+# sent as an approximation of the API search, see get_warm_up_search
+ELASTIC_WARM_UP_QUERIES = json.loads(Variable.get("ELASTIC_WARM_UP_QUERIES", "[]"))
+ELASTIC_WARM_UP_LATENCY_BUDGET = int(
+    Variable.get("ELASTIC_WARM_UP_LATENCY_BUDGET", 1000)
+)
+# Load test of the new index against the live one before updating the alias. The
+# queries are weighted (e.g. {"q=rue": 3}), the slow requests and warm-up queries
+# by default. A warning is logged if a latency percentile of the new index is more
+# than the threshold times, and more than the delta (milliseconds), slower than the
+# live one
+ELASTIC_LOAD_TEST_QUERIES = json.loads(Variable.get("ELASTIC_LOAD_TEST_QUERIES", "{}"))
+ELASTIC_LOAD_TEST_REQUEST_COUNT = int(
+    Variable.get("ELASTIC_LOAD_TEST_REQUEST_COUNT", 300)
+)
+ELASTIC_LOAD_TEST_THREAD_COUNT = int(Variable.get("ELASTIC_LOAD_TEST_THREAD_COUNT", 8))
+ELASTIC_LATENCY_REGRESSION_THRESHOLD = float(
+    Variable.get("ELASTIC_LATENCY_REGRESSION_THRESHOLD", 1.5)
+)
+ELASTIC_LATENCY_REGRESSION_MIN_DELTA = float(
+    Variable.get("ELASTIC_LATENCY_REGRESSION_MIN_DELTA", 50)
+)
+
 ELASTIC_SNAPSHOT_REPOSITORY = Variable.get("ELASTIC_SNAPSHOT_REPOSITORY", "data-prod")
 ELASTIC_SNAPSHOT_MAX_REVISIONS = 5
 ELASTIC_SNAPSHOT_MINIO_STATE_PATH = Variable.get(
     "ELASTIC_SNAPSHOT_MINIO_STATE_PATH", "elastic_index_version"
 )
+ELASTIC_INDEXING_CHECKPOINT_MINIO_PATH = Variable.get(
+    "ELASTIC_INDEXING_CHECKPOINT_MINIO_PATH", "elastic_indexing_checkpoint"
+)
 
 ELASTIC_DOWNSTREAM_ALIAS = Variable.get("ELASTIC_DOWNSTREAM_ALIAS", "siren-reader")
 # comma separated URL
@@ -118,6 +184,7 @@ ELASTIC_DOWNSTREAM_USER = Variable.get("ELASTIC_DOWNSTREAM_USER", "")
 ELASTIC_DOWNSTREAM_PASSWORD = Variable.get("ELASTIC_DOWNSTREAM_PASSWORD", "")
 
 API_URL = Variable.get("API_URL", "")
+API_WARM_UP_THREAD_COUNT = int(Variable.get("API_WARM_UP_THREAD_COUNT", 4))
 API_IS_REMOTE = Variable.get("API_IS_REMOTE", "False").lower() not in ["false", "0"]
 
 # Datasets
@@ -1,19 +1,31 @@
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 
-from dag_datalake_sirene.config import API_URL
+from dag_datalake_sirene.config import API_URL, API_WARM_UP_THREAD_COUNT
 from dag_datalake_sirene.helpers.slow_requests import SLOW_REQUESTS
 
+# One session, and so one connection pool, per thread
+sessions = threading.local()
 
-def execute_slow_requests():
-    session = requests.Session()
-    base_url = API_URL
-    for query in SLOW_REQUESTS:
+
+def execute_slow_request(query):
+    if not hasattr(sessions, "session"):
+        sessions.session = requests.Session()
+    path = f"/search?{query}"
+    logging.info(f"******* Searching query : {query}")
+    response = sessions.session.get(url=API_URL + path)
+    logging.info(f"******* Request status for {query} : {response.status_code}")
+    response.raise_for_status()
+
+
+def execute_slow_requests(**kwargs):
+    """Fill the API cache with the slow requests, sent concurrently so that the
+    cache is warm before the first users hit the new index."""
+    with ThreadPoolExecutor(max_workers=API_WARM_UP_THREAD_COUNT) as executor:
         try:
-            path = f"/search?{query}"
-            logging.info(f"******* Searching query : {query}")
-            response = session.get(url=base_url + path)
-            logging.info(f"******* Request status : {response.status_code}")
-            response.raise_for_status()
+            # list() raises the first error of the requests
+            list(executor.map(execute_slow_request, sorted(SLOW_REQUESTS)))
         except requests.exceptions.RequestException as error:
             raise SystemExit(error)
@@ -51,3 +51,6 @@ class Filesystem:
                 self.tmp_dirpath,
                 self.serializer.get_content_type(),
             )
+
+    def delete(self, filename):
+        self.client.delete_file(f"{self.dirpath}{filename}")
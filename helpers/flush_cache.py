@@ -1,16 +1,116 @@
 import logging
 import redis
 
+from dag_datalake_sirene.config import (
+    REDIS_CACHE_IS_NAMESPACED,
+    REDIS_CACHE_VERSION_KEY,
+    REDIS_PREVIOUS_CACHE_TTL,
+)
 
-def flush_cache(host, port, db, password):
-    redis_client = redis.Redis(
+# Number of keys per SCAN iteration and per UNLINK or EXPIRE pipeline
+CACHE_SCAN_COUNT = 1000
+
+
+def get_redis_client(host, port, db, password):
+    return redis.Redis(
         host=host,
         port=port,
         db=db,
         password=password,
     )
+
+
+def flush_cache(host, port, db, password):
+    redis_client = get_redis_client(host, port, db, password)
     # Delete keys in the background in a different thread without blocking the server
     flush_command = redis_client.execute_command("FLUSHALL ASYNC")
     logging.info(f"Flush cache command status: {flush_command}")
-    if redis_client.keys():
-        raise Exception(f"****** Could not flush cache: {redis_client.keys()}")
+    # DBSIZE is O(1), unlike KEYS which blocks the server while listing every key
+    key_count = redis_client.dbsize()
+    if key_count:
+        raise Exception(f"****** Could not flush cache: {key_count} keys left")
+
+
+def expire_cache_namespace(redis_client, namespace, ttl):
+    """Delete, or expire after `ttl` seconds, the keys prefixed by `namespace`.
+    The keys are listed with SCAN, which does not block the server, and deleted
+    with UNLINK, which frees their memory in the background."""
+    return expire_scanned_keys(
+        redis_client,
+        redis_client.scan_iter(match=f"{namespace}:*", count=CACHE_SCAN_COUNT),
+        ttl,
+    )
+
+
+def delete_keys_outside_namespace(redis_client, namespace):
+    """Delete every key but the version key and the keys prefixed by `namespace`,
+    i.e. the keys cached by an API which does not prefix its keys yet."""
+    keys = (
+        key
+        for key in redis_client.scan_iter(count=CACHE_SCAN_COUNT)
+        if key != REDIS_CACHE_VERSION_KEY.encode()
+        and not key.startswith(f"{namespace}:".encode())
+    )
+    return expire_scanned_keys(redis_client, keys, 0)
+
+
+def expire_scanned_keys(redis_client, scanned_keys, ttl):
+    key_count = 0
+    keys = []
+    for key in scanned_keys:
+        keys.append(key)
+        if len(keys) >= CACHE_SCAN_COUNT:
+            key_count += expire_keys(redis_client, keys, ttl)
+            keys = []
+    if keys:
+        key_count += expire_keys(redis_client, keys, ttl)
+    return key_count
+
+
+def expire_keys(redis_client, keys, ttl):
+    if not ttl:
+        return redis_client.unlink(*keys)
+    pipeline = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipeline.expire(key, ttl)
+    return sum(pipeline.execute())
+
+
+def update_cache_version(host, port, db, password, **kwargs):
+    """
+    Switch the API cache to the namespace of the new index, then drop the
+    namespace of the previous index.
+
+    The API must read the namespace from `REDIS_CACHE_VERSION_KEY` and prefix each
+    of its keys with `{namespace}:`. Until `REDIS_CACHE_IS_NAMESPACED` says it does,
+    and on the first run, when there is no previous namespace, the keys outside the
+    new namespace are deleted, so that no response cached for a previous index is
+    served.
+    """
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="get_next_index_name"
+    )
+    redis_client = get_redis_client(host, port, db, password)
+    previous_namespace = redis_client.getset(REDIS_CACHE_VERSION_KEY, elastic_index)
+    logging.info(
+        f"******* Cache namespace updated from {previous_namespace} to {elastic_index}"
+    )
+    if previous_namespace is None or not REDIS_CACHE_IS_NAMESPACED:
+        key_count = delete_keys_outside_namespace(redis_client, elastic_index)
+        logging.info(f"******* {key_count} keys outside {elastic_index} deleted")
+        return
+    if previous_namespace.decode() == elastic_index:
+        return
+
+    key_count = expire_cache_namespace(
+        redis_client, previous_namespace.decode(), REDIS_PREVIOUS_CACHE_TTL
+    )
+    if REDIS_PREVIOUS_CACHE_TTL:
+        logging.info(
+            f"******* {key_count} keys of {previous_namespace.decode()} expire in "
+            f"{REDIS_PREVIOUS_CACHE_TTL}s"
+        )
+    else:
+        logging.info(
+            f"******* {key_count} keys of {previous_namespace.decode()} deleted"
+        )
@@ -1,3 +1,4 @@
+import numpy as np
 from pyproj import Transformer
 from dag_datalake_sirene.helpers.utils import is_valid_number
 from functools import lru_cache
@@ -25,14 +26,50 @@ def get_transformer(epsg):
     return Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326")
 
 
+def get_epsg(department_code):
+    return department_epsg_mapping.get(department_code, default_epsg)
+
+
 # Function to perform the transformation
 def transform_coordinates(department_code, x, y):
     if not is_valid_number(x) or not is_valid_number(y):
         return None, None
-    if department_code in department_epsg_mapping:
-        epsg = department_epsg_mapping[department_code]
-    else:
-        epsg = default_epsg
-    transformer = get_transformer(epsg)
+    transformer = get_transformer(get_epsg(department_code))
     lat, lon = transformer.transform(float(x), float(y))
     return str(lat), str(lon)
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def transform_coordinates_batch(department_codes, xs, ys):
+    """
+    Same as `transform_coordinates` for a sequence of points: return the list of
+    their latitudes and the list of their longitudes.
+
+    The points are grouped by EPSG code, and each group is transformed in a single
+    call on numpy arrays instead of one call per point.
+    """
+    x_values = np.array([to_float(x) for x in xs], dtype=float)
+    y_values = np.array([to_float(y) for y in ys], dtype=float)
+    epsgs = np.array([get_epsg(code) for code in department_codes], dtype=int)
+    valid = ~(np.isnan(x_values) | np.isnan(y_values))
+
+    latitudes = np.full(len(valid), np.nan)
+    longitudes = np.full(len(valid), np.nan)
+    for epsg in np.unique(epsgs[valid]):
+        group = valid & (epsgs == epsg)
+        latitudes[group], longitudes[group] = get_transformer(int(epsg)).transform(
+            x_values[group], y_values[group]
+        )
+
+    # tolist() gives Python floats, formatted as `transform_coordinates` does
+    valid = valid.tolist()
+    return (
+        [str(lat) if v else None for lat, v in zip(latitudes.tolist(), valid)],
+        [str(lon) if v else None for lon, v in zip(longitudes.tolist(), valid)],
+    )
@@ -1,18 +1,95 @@
 import logging
 import sqlite3
+import time
+
+# "build": one-shot construction of a database, which is rebuilt from scratch when
+# anything fails and only needs to be consistent once its connection is closed
+SQLITE_BUILD_MODE = "build"
+# "read": read-only access to a database which nobody modifies while it is read
+SQLITE_READ_MODE = "read"
+
+SQLITE_CACHE_SIZE = -512 * 1024  # KiB (negative values are sizes, not pages)
+# Capped by the SQLITE_MAX_MMAP_SIZE of the sqlite library
+SQLITE_MMAP_SIZE = 16 * 1024**3
+SQLITE_BUILD_PRAGMAS = {
+    # Only applied to a new database, before its first table is created
+    "page_size": 16384,
+    # The rollback journal is kept in memory, so that a failed statement can still
+    # be rolled back, but nothing is written to disk for it
+    "journal_mode": "MEMORY",
+    # No fsync, the database is synced once when it is uploaded
+    "synchronous": "OFF",
+    "cache_size": SQLITE_CACHE_SIZE,
+    # The temporary tables of the ETL (e.g. etablissement_index_feed) do not fit in
+    # memory, they are written to unsynced temporary files
+    "temp_store": "FILE",
+    "mmap_size": SQLITE_MMAP_SIZE,
+}
+SQLITE_READ_PRAGMAS = {
+    "cache_size": SQLITE_CACHE_SIZE,
+    "mmap_size": SQLITE_MMAP_SIZE,
+}
 
 
 class SqliteClient:
+    """
+    Connection to a sqlite database
+    :param db_location: path of the database file
+    :type db_location: str
+    :param timeout: seconds to wait for a lock on the database
+    :type timeout: int
+    :param mode: None for a default connection, `SQLITE_BUILD_MODE` while building
+        the database, `SQLITE_READ_MODE` to read a database which no longer changes
+    :type mode: str
+
+    In read mode, the file is opened read-only and immutable, so that sqlite
+    neither locks it nor checks whether it changed, and it is read through a large
+    memory map.
+    """
+
     # Connect to database
-    def __init__(self, db_location, timeout=30):
+    def __init__(self, db_location, timeout=30, mode=None):
         self.db_location = db_location
-        self.db_conn = sqlite3.connect(self.db_location, timeout=timeout)
+        if mode == SQLITE_READ_MODE:
+            self.db_conn = sqlite3.connect(
+                f"file:{self.db_location}?mode=ro&immutable=1",
+                timeout=timeout,
+                uri=True,
+            )
+        else:
+            self.db_conn = sqlite3.connect(self.db_location, timeout=timeout)
         logging.info(
             f"*********** Connecting to database {self.db_location}! " f"***********"
         )
         self.db_cursor = self.db_conn.cursor()
+        self.deferred_indexes = []
+
+        pragmas = {
+            SQLITE_BUILD_MODE: SQLITE_BUILD_PRAGMAS,
+            SQLITE_READ_MODE: SQLITE_READ_PRAGMAS,
+        }.get(mode, {})
+        for pragma, value in pragmas.items():
+            self.execute(f"PRAGMA {pragma} = {value}")
+
+    def defer_index(self, index_name, create_index_query):
+        """Declare an index of a table being loaded, built when the connection is
+        committed and closed."""
+        self.deferred_indexes.append((index_name, create_index_query))
+
+    def create_deferred_indexes(self):
+        # An index built in one sorted pass over a loaded table is much faster to
+        # create than an index updated row by row
+        for index_name, create_index_query in self.deferred_indexes:
+            start = time.monotonic()
+            self.execute(create_index_query)
+            logging.info(
+                f"************ Index {index_name} built in "
+                f"{time.monotonic() - start:.1f}s"
+            )
+        self.deferred_indexes = []
 
     def commit_and_close_conn(self):
+        self.create_deferred_indexes()
         self.db_conn.commit()
         self.db_conn.close()
 
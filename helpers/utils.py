@@ -222,6 +222,16 @@ def save_dataframe(df: pd.DataFrame, file_path: str, chunk_size: int = 100000):
                 zipped_file.write(chunk)
 
 
+def download_file(url: str, file_path: str, block_size: int = 1024 * 1024) -> None:
+    """Stream the file at `url` to `file_path` by blocks of `block_size` bytes,
+    so that a large file is never held in memory."""
+    with requests.get(url, allow_redirects=True, stream=True) as r:
+        r.raise_for_status()
+        with open(file_path, "wb") as f:
+            for block in r.iter_content(chunk_size=block_size):
+                f.write(block)
+
+
 def flatten_object(obj, prop):
     res = ""
     for item in obj:
@@ -0,0 +1,157 @@
+"""
+Index layout benchmark: copy a loaded siren index into one index per layout
+(number of shards, index sort, codec), then compare their size on disk and their
+search latency.
+
+Only the size sorted searches can terminate early on a sorted index: the search
+API approximation counts all its hits (`track_total_hits`), whatever the index
+sort.
+
+On a local single-node Elasticsearch holding a loaded index:
+    python -m dag_datalake_sirene.tests.e2e_tests.index_layout_benchmark \
+        --elastic-url http://localhost:9200 --source siren-20240208001729
+"""
+
+import argparse
+import json
+import logging
+
+from elasticsearch import Elasticsearch
+
+from dag_datalake_sirene.helpers.slow_requests import SLOW_REQUESTS
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.load_test import (
+    LOAD_TEST_REQUEST_TIMEOUT,
+    format_load_test_report,
+    get_elastic_search,
+    get_query_mix,
+    run_load_test,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
+    StructureMapping,
+    get_index_settings,
+)
+
+SIZE_SORT = {"unite_legale.facteur_taille_entreprise": "desc"}
+DEFAULT_LAYOUTS = {
+    "2-shards": {"shards": 2, "sort": {}, "codec": "default"},
+    "2-shards-sorted": {"shards": 2, "sort": SIZE_SORT, "codec": "default"},
+    "2-shards-sorted-compressed": {
+        "shards": 2,
+        "sort": SIZE_SORT,
+        "codec": "best_compression",
+    },
+    "1-shard-sorted": {"shards": 1, "sort": SIZE_SORT, "codec": "default"},
+}
+REINDEX_TIMEOUT = 6 * 3600  # seconds
+
+
+def create_layout_index(elastic_connection, source_index, layout_index, layout):
+    """Create `layout_index` with the siren mapping and the settings of `layout`,
+    copy the documents of `source_index` into it and merge it into one segment per
+    shard, as the indexing DAG does."""
+    index = StructureMapping._index.clone(layout_index)
+    index.settings(**get_index_settings(**layout))
+    index.create()
+    elastic_connection.reindex(
+        body={"source": {"index": source_index}, "dest": {"index": layout_index}},
+        refresh=True,
+        request_timeout=REINDEX_TIMEOUT,
+    )
+    elastic_connection.indices.forcemerge(
+        index=layout_index, max_num_segments=1, request_timeout=REINDEX_TIMEOUT
+    )
+
+
+def get_index_size(elastic_connection, elastic_index):
+    stats = elastic_connection.indices.stats(index=elastic_index, metric="store")
+    return stats["indices"][elastic_index]["primaries"]["store"]["size_in_bytes"]
+
+
+def get_size_sorted_search(elastic_connection, elastic_index):
+    """Search function listing the biggest active companies, the query shape which
+    index sorting on `facteur_taille_entreprise` terminates early."""
+
+    def search(api_query):
+        elastic_connection.search(
+            index=elastic_index,
+            body={
+                "query": {
+                    "term": {"unite_legale.etat_administratif_unite_legale": "A"}
+                },
+                "sort": [{"unite_legale.facteur_taille_entreprise": "desc"}],
+                "size": 10,
+                "track_total_hits": False,
+            },
+            request_timeout=LOAD_TEST_REQUEST_TIMEOUT,
+        )
+
+    return search
+
+
+def benchmark_layout(elastic_connection, elastic_index, queries, thread_count):
+    report = {"size_in_bytes": get_index_size(elastic_connection, elastic_index)}
+    for name, search in [
+        ("search", get_elastic_search(elastic_connection, elastic_index)),
+        ("size_sorted", get_size_sorted_search(elastic_connection, elastic_index)),
+    ]:
+        # A first run loads the index into memory, the second one is measured
+        run_load_test(search, queries, thread_count)
+        report[name] = run_load_test(search, queries, thread_count)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--elastic-url", default="http://localhost:9200")
+    parser.add_argument("--source", required=True, help="Loaded siren index to copy")
+    parser.add_argument(
+        "--layouts",
+        help='JSON file of layouts, e.g. {"1-shard": {"shards": 1, "sort": {}, '
+        '"codec": "default"}}',
+    )
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the layout indices afterwards"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    layouts = DEFAULT_LAYOUTS
+    if args.layouts:
+        with open(args.layouts) as layouts_file:
+            layouts = json.load(layouts_file)
+    queries = get_query_mix({query: 1 for query in SLOW_REQUESTS}, args.requests)
+
+    elastic_connection = Elasticsearch([args.elastic_url])
+    reports = {}
+    for name, layout in layouts.items():
+        layout_index = f"{args.source}-benchmark-{name}"
+        logging.info(f"Creating {layout_index}")
+        try:
+            create_layout_index(elastic_connection, args.source, layout_index, layout)
+            reports[name] = benchmark_layout(
+                elastic_connection, layout_index, queries, args.threads
+            )
+        finally:
+            # Also removes a layout index left half built by a failed copy or merge
+            if not args.keep:
+                elastic_connection.indices.delete(
+                    index=layout_index, ignore_unavailable=True
+                )
+
+    for name, report in reports.items():
+        logging.info(
+            f"{name}: {report['size_in_bytes'] / 1024**2:.0f}MB\n"
+            f"  search (no early termination): "
+            f"{format_load_test_report(report['search'])}\n"
+            f"  size sorted: {format_load_test_report(report['size_sorted'])}"
+        )
+    logging.info(
+        "Only the size sorted searches exercise the early termination of a sorted "
+        "index, the search counts all its hits"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Search load test: send a mix of search queries concurrently, to an Elasticsearch
+index or to the search API, and report the latency percentiles and throughput.
+
+Against a local single-node Elasticsearch, comparing a new index to the alias:
+    python -m dag_datalake_sirene.tests.e2e_tests.load_tester \
+        --elastic-url http://localhost:9200 --index siren-20240208001729 \
+        --baseline siren-reader
+"""
+
+import argparse
+import json
+import logging
+
+from elasticsearch import Elasticsearch
+
+from dag_datalake_sirene.helpers.slow_requests import SLOW_REQUESTS
+from dag_datalake_sirene.tests.e2e_tests.response_tester import (
+    APIResponseTester,
+    ok_status_code,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.load_test import (
+    format_load_test_report,
+    get_elastic_search,
+    get_latency_regressions,
+    get_query_mix,
+    run_load_test,
+)
+
+
+def get_api_search(api_url):
+    """Search function sending a query to the search API."""
+    api_response_tester = APIResponseTester(api_url)
+
+    def search(api_query):
+        response = api_response_tester.get_api_response(f"/search?{api_query}")
+        if response.status_code != ok_status_code:
+            raise Exception(
+                f"API response code is {response.status_code} for {api_query}"
+            )
+
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--elastic-url", default="http://localhost:9200")
+    parser.add_argument("--index", help="Elasticsearch index or alias to test")
+    parser.add_argument("--baseline", help="Elasticsearch index or alias to compare")
+    parser.add_argument("--api-url", help="Test the search API instead")
+    parser.add_argument(
+        "--queries",
+        help='JSON file of query weights, e.g. {"q=rue": 3}, the slow requests '
+        "by default",
+    )
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--min-delta", type=float, default=50)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.queries:
+        with open(args.queries) as queries_file:
+            query_weights = json.load(queries_file)
+    else:
+        query_weights = {query: 1 for query in SLOW_REQUESTS}
+    queries = get_query_mix(query_weights, args.requests)
+
+    if args.api_url:
+        report = run_load_test(get_api_search(args.api_url), queries, args.threads)
+        logging.info(f"{args.api_url}: {format_load_test_report(report)}")
+        return
+
+    elastic_connection = Elasticsearch([args.elastic_url])
+    reports = {}
+    for elastic_index in filter(None, [args.index, args.baseline]):
+        reports[elastic_index] = run_load_test(
+            get_elastic_search(elastic_connection, elastic_index),
+            queries,
+            args.threads,
+        )
+        logging.info(
+            f"{elastic_index}: {format_load_test_report(reports[elastic_index])}"
+        )
+
+    if args.baseline:
+        regressions = get_latency_regressions(
+            reports[args.index], reports[args.baseline], args.threshold, args.min_delta
+        )
+        if regressions:
+            raise SystemExit(f"Latency regression: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
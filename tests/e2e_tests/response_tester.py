@@ -27,14 +27,15 @@ def get_field_value(results, field_name):
 class APIResponseTester:
     def __init__(self, api_url):
         self.api_url = api_url
-
-    def get_api_response(self, path):
-        session = requests.Session()
+        # A single session keeps the connections open between requests
+        self.session = requests.Session()
         retry = Retry(connect=3, backoff_factor=3)
         adapter = HTTPAdapter(max_retries=retry)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        response = session.get(url=self.api_url + path)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_api_response(self, path):
+        response = self.session.get(url=self.api_url + path)
         return response
 
     def get_api_response_code(self, path):
@@ -0,0 +1,44 @@
+import itertools
+
+import pandas as pd
+
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.data_enrichment import (
+    format_nom_complet,
+    format_nom_complet_column,
+    format_slug,
+    format_slug_column,
+)
+
+
+def test_format_nom_complet_column_matches_format_nom_complet():
+    values = [None, "", "Dupont", "  l'Étoile "]
+    rows = list(itertools.product(values, repeat=4))
+    df = pd.DataFrame(
+        rows, columns=["nom", "nom_usage", "nom_raison_sociale", "prenom"]
+    )
+
+    noms_complets = format_nom_complet_column(
+        df["nom"], df["nom_usage"], df["nom_raison_sociale"], df["prenom"]
+    )
+
+    assert [None if pd.isna(x) else x for x in noms_complets] == [
+        format_nom_complet(*row) for row in rows
+    ]
+
+
+def test_format_slug_column_matches_format_slug():
+    denominations = [None, "", "Café", "SUPPRESSION DU NOM COMMERCIAL"]
+    rows = [
+        (nom_complet, sigle, nom_commercial, *denominations_usuelles, siren, statut)
+        for nom_complet in [None, "", "SARL L'ÉDUCATION"]
+        for sigle in [None, "SE"]
+        for nom_commercial in [None, "", "Le Bon Coin"]
+        for denominations_usuelles in itertools.product(denominations, repeat=3)
+        for siren in [None, "123456789"]
+        for statut in ["O", "P", None]
+    ]
+    df = pd.DataFrame(rows)
+
+    slugs = format_slug_column(*(df[column] for column in df.columns))
+
+    assert slugs.tolist() == [format_slug(*row) for row in rows]
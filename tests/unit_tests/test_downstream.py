@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions import (
+    downstream,
+)
+
+ELASTIC_INDEX = "siren-20240208001729"
+
+
+def start_downstream_stub(restore_duration, error_duration=0):
+    """Downstream Elasticsearch restoring `ELASTIC_INDEX` in `restore_duration`
+    seconds, then serving it behind the alias. It answers with an HTML error page
+    during the first `error_duration` seconds."""
+    start = time.monotonic()
+    total_bytes = 1000
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            elapsed = time.monotonic() - start
+            if elapsed < error_duration:
+                self.send_response(503)
+                self.send_header("Content-Type", "text/html")
+                self.end_headers()
+                self.wfile.write(b"<html>Service Unavailable</html>")
+                return
+            restored = elapsed >= restore_duration
+            if self.path == f"/{downstream.ELASTIC_DOWNSTREAM_ALIAS}":
+                body = {ELASTIC_INDEX: {}} if restored else None
+            elif self.path == f"/{ELASTIC_INDEX}/_recovery":
+                recovered_bytes = min(
+                    total_bytes, int(total_bytes * elapsed / restore_duration)
+                )
+                size = {
+                    "recovered_in_bytes": recovered_bytes,
+                    "total_in_bytes": total_bytes,
+                }
+                body = {ELASTIC_INDEX: {"shards": [{"index": {"size": size}}]}}
+            elif self.path == f"/_cluster/health/{ELASTIC_INDEX}":
+                body = {"status": "green"}
+            else:
+                body = None
+            self.send_response(404 if body is None else 200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body or {}).encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(downstream, "DOWNSTREAM_POLL_INTERVAL", 0.05)
+
+
+def test_downstream_targets_are_polled_concurrently(fast_polling):
+    servers = [start_downstream_stub(0.5) for _ in range(3)]
+    urls = [f"http://127.0.0.1:{server.server_port}" for server in servers]
+
+    start = time.monotonic()
+    statuses = downstream.wait_for_downstream_index_import(ELASTIC_INDEX, urls)
+
+    # Waiting for each target in sequence would take 1.5s
+    assert time.monotonic() - start < 1.2
+    assert [status["url"] for status in statuses] == urls
+    assert all(status["completed"] for status in statuses)
+    assert all(status["total_bytes"] == 1000 for status in statuses)
+    for server in servers:
+        server.shutdown()
+
+
+def test_downstream_errors_are_retried_until_the_deadline(fast_polling):
+    servers = [start_downstream_stub(0.3, error_duration=0.3), start_downstream_stub(0)]
+    urls = [f"http://127.0.0.1:{server.server_port}" for server in servers]
+
+    statuses = downstream.wait_for_downstream_index_import(ELASTIC_INDEX, urls)
+
+    assert all(status["completed"] for status in statuses)
+    for server in servers:
+        server.shutdown()
+
+
+def test_downstream_timeout_reports_pending_targets(fast_polling, monkeypatch):
+    monkeypatch.setattr(downstream, "DOWNSTREAM_TIMEOUT", 0.3)
+    server = start_downstream_stub(60)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    with pytest.raises(Exception, match="taking too long"):
+        downstream.wait_for_downstream_index_import(ELASTIC_INDEX, [url])
+    server.shutdown()
@@ -0,0 +1,23 @@
+from dag_datalake_sirene.helpers.geolocalisation import (
+    transform_coordinates,
+    transform_coordinates_batch,
+)
+
+
+def test_transform_coordinates_batch_matches_transform_coordinates():
+    points = [
+        ("75", "652469.5", "6862035.2"),
+        ("971", "653000.1", "1775000.3"),
+        ("988", "446000", "214000"),
+        ("13", None, "6250000"),
+        ("974", "340000", "7690000"),
+        (None, "[ND]", "6862035.2"),
+        ("75", "651000", "6861000"),
+    ]
+    departements, xs, ys = zip(*points)
+
+    latitudes, longitudes = transform_coordinates_batch(departements, xs, ys)
+
+    assert list(zip(latitudes, longitudes)) == [
+        transform_coordinates(*point) for point in points
+    ]
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from elasticsearch.helpers import expand_action
+from elasticsearch.serializer import JSONSerializer
+
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
+    StructureMapping,
+)
+
+# fmt: off
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.\
+    indexing_unite_legale import (
+    doc_unite_legale_generator,
+    serialize_bulk_action,
+)
+# fmt: on
+
+
+def dsl_doc_unite_legale_generator(data, elastic_index):
+    """Reference implementation, building the documents with elasticsearch_dsl."""
+    for document in data:
+        etablissements = document["unite_legale"]["etablissements"]
+        for start in range(0, max(len(etablissements), 1), 100):
+            smaller_document = json.loads(json.dumps(document))
+            smaller_document["unite_legale"]["etablissements"] = etablissements[
+                start : start + 100
+            ]
+            yield StructureMapping(
+                meta={
+                    "index": elastic_index,
+                    "id": f"{document['identifiant']}-{start + 100}",
+                },
+                **smaller_document,
+            ).to_dict(include_meta=True)
+
+
+def get_unite_legale(siren, etablissements_count):
+    return {
+        "identifiant": siren,
+        "nom_complet": f"société {siren}",
+        "adresse": None,
+        "unite_legale": {
+            "siren": siren,
+            "nombre_etablissements": etablissements_count,
+            "est_entrepreneur_spectacle": False,
+            "liste_dirigeants": [],
+            "bilan_financier": {},
+            "sigle": None,
+            "etablissements": [
+                {
+                    "siret": f"{siren}{i:05d}",
+                    "est_siege": i == 0,
+                    "latitude": 48.8566 + i / 1000,
+                    "liste_rge": None,
+                }
+                for i in range(etablissements_count)
+            ],
+        },
+    }
+
+
+@pytest.mark.parametrize("etablissements_count", [0, 1, 100, 101, 200, 250])
+def test_doc_unite_legale_generator_matches_dsl(etablissements_count):
+    data = [get_unite_legale("123456789", etablissements_count)]
+
+    actions = list(doc_unite_legale_generator(data, "siren-test"))
+
+    assert actions == list(dsl_doc_unite_legale_generator(data, "siren-test"))
+
+
+def test_serialize_bulk_action_matches_bulk_helpers():
+    serializer = JSONSerializer()
+    data = [get_unite_legale("123456789", 150)]
+
+    for action in doc_unite_legale_generator(data, "siren-test"):
+        expected = tuple(
+            serializer.dumps(line).encode() for line in expand_action(action)
+        )
+        assert serialize_bulk_action(action) == expected
@@ -0,0 +1,33 @@
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.load_test import (
+    get_latency_regressions,
+    get_percentile,
+    get_query_mix,
+    run_load_test,
+)
+
+
+def test_get_query_mix_follows_weights():
+    queries = get_query_mix({"q=rue": 3, "q=france": 1}, 400)
+
+    assert queries.count("q=rue") == 300
+    assert queries.count("q=france") == 100
+    assert queries == get_query_mix({"q=rue": 3, "q=france": 1}, 400)
+
+
+def test_get_percentile():
+    latencies = list(range(1, 101))
+
+    assert get_percentile(latencies, 50) == 50
+    assert get_percentile(latencies, 99) == 99
+    assert get_percentile([7], 95) == 7
+
+
+def test_run_load_test_reports_latency_regressions():
+    baseline = run_load_test(lambda api_query: None, ["q=rue"] * 20, 4)
+    candidate = {**baseline, "p95": baseline["p95"] * 2 + 100}
+
+    assert baseline["requests"] == 20
+    assert get_latency_regressions(candidate, baseline, 1.5, 50) == [
+        f"p95 {candidate['p95']}ms against {baseline['p95']}ms"
+    ]
+    assert get_latency_regressions(baseline, baseline, 1.5, 50) == []
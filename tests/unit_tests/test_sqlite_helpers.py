@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.helpers import (
+    load_table,
+)
+
+
+def test_load_table_inserts_the_same_rows_as_to_sql(tmp_path):
+    sqlite_client = SqliteClient(str(tmp_path / "sirene.db"))
+    for table_name in ["loaded", "expected"]:
+        sqlite_client.execute(
+            f"CREATE TABLE {table_name} (siren TEXT, nom TEXT, ca REAL, rang INTEGER)"
+        )
+    df_chunks = [
+        pd.DataFrame(
+            {
+                "siren": ["123456789", "987654321"],
+                "nom": ["Dupont", np.nan],
+                "ca": [1.5, np.nan],
+                "rang": [1, 2],
+            }
+        ),
+        pd.DataFrame({"siren": ["111111111"], "nom": [None]}),
+    ]
+
+    row_count = load_table(sqlite_client, "loaded", df_chunks)
+    for df_chunk in df_chunks:
+        df_chunk.to_sql(
+            "expected", sqlite_client.db_conn, if_exists="append", index=False
+        )
+
+    assert row_count == 3
+    assert (
+        sqlite_client.execute("SELECT * FROM loaded").fetchall()
+        == sqlite_client.execute("SELECT * FROM expected").fetchall()
+    )
+    sqlite_client.commit_and_close_conn()
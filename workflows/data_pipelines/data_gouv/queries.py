@@ -86,6 +86,7 @@ SELECT ul.etat_administratif_unite_legale as etat_administratif,
     ) as liste_idcc,
     ul.nature_juridique_unite_legale as nature_juridique,
     ul.nom as nom,
+    ul.nom_complet as nom_complet,
     ul.nom_raison_sociale as nom_raison_sociale,
     ul.nom_usage as nom_usage,
     (
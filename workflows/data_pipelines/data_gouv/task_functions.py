@@ -7,7 +7,10 @@ import os
 import pandas as pd
 import json
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_READ_MODE,
+    SqliteClient,
+)
 from dag_datalake_sirene.helpers.datagouv import post_resource
 from dag_datalake_sirene.workflows.data_pipelines.data_gouv.queries import (
     etab_fields_to_select,
@@ -16,7 +19,6 @@ from dag_datalake_sirene.workflows.data_pipelines.data_gouv.queries import (
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.data_enrichment import (
     create_list_names_elus,
     format_adresse_complete,
-    format_nom_complet,
     is_association,
     is_entrepreneur_individuel,
     is_ess,
@@ -30,7 +32,7 @@ from dag_datalake_sirene.helpers.utils import (
     sqlite_str_to_bool,
 )
 from dag_datalake_sirene.helpers.geolocalisation import (
-    transform_coordinates,
+    transform_coordinates_batch,
 )
 from dag_datalake_sirene.helpers.tchap import send_message
 from dag_datalake_sirene.config import (
@@ -83,14 +85,6 @@ def process_ul_chunk(chunk):
     # Transformations on columns
     chunk["colter_elus"] = chunk["colter_elus"].apply(json.loads)
 
-    # Generate 'nom_complet'
-    chunk["nom_complet"] = chunk.apply(
-        lambda row: format_nom_complet(
-            row["nom"], row["nom_usage"], row["nom_raison_sociale"], row["prenom"]
-        ),
-        axis=1,
-    )
-
     # Fill NA values in 'nombre_etablissements_ouverts'
     chunk["nombre_etablissements_ouverts"].fillna(0, inplace=True)
 
@@ -145,7 +139,9 @@ def process_ul_chunk(chunk):
 
 def fill_ul_file():
     chunk_size = 100000
-    sqlite_client = SqliteClient(AIRFLOW_DATAGOUV_DATA_DIR + "sirene.db")
+    sqlite_client = SqliteClient(
+        AIRFLOW_DATAGOUV_DATA_DIR + "sirene.db", mode=SQLITE_READ_MODE
+    )
 
     ul_csv_path = f"{AIRFLOW_DATAGOUV_DATA_DIR}unites_legales_{today_date}.csv"
 
@@ -249,11 +245,9 @@ def process_etablissement_chunk(chunk):
         axis=1,
     )
     chunk["departement"] = chunk["commune"].apply(format_departement)
-    coordinates = chunk.apply(
-        lambda row: transform_coordinates(row["departement"], row["x"], row["y"]),
-        axis=1,
+    chunk["latitude"], chunk["longitude"] = transform_coordinates_batch(
+        chunk["departement"], chunk["x"], chunk["y"]
     )
-    chunk["latitude"], chunk["longitude"] = zip(*coordinates)
     chunk["est_siege"] = chunk["est_siege"].apply(str_to_bool)
     chunk["ancien_siege"] = chunk["ancien_siege"].apply(sqlite_str_to_bool)
     chunk["liste_idcc"] = chunk["liste_idcc"].apply(str_to_list)
@@ -267,7 +261,9 @@ def process_etablissement_chunk(chunk):
 
 def fill_etab_file():
     chunk_size = 100000
-    sqlite_client = SqliteClient(AIRFLOW_DATAGOUV_DATA_DIR + "sirene.db")
+    sqlite_client = SqliteClient(
+        AIRFLOW_DATAGOUV_DATA_DIR + "sirene.db", mode=SQLITE_READ_MODE
+    )
 
     etab_csv_path = f"{AIRFLOW_DATAGOUV_DATA_DIR}etablissements_{today_date}.csv"
 
@@ -4,7 +4,8 @@ from airflow.models import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.trigger_dagrun import TriggerDagRunOperator
 
-from dag_datalake_sirene.helpers.flush_cache import flush_cache
+from dag_datalake_sirene.helpers.flush_cache import update_cache_version
+from dag_datalake_sirene.helpers.execute_slow_queries import execute_slow_requests
 
 # fmt: off
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.\
@@ -12,6 +13,10 @@ from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.\
     get_next_index_name,
     check_elastic_index,
     create_elastic_index,
+    force_merge_elastic_index,
+    restore_elastic_index_settings,
+    warm_up_elastic_index,
+    check_search_latency,
     update_elastic_alias,
     fill_elastic_siren_index,
     delete_previous_elastic_indices,
@@ -112,6 +117,30 @@ with DAG(
         python_callable=check_elastic_index,
     )
 
+    force_merge_elastic_index = PythonOperator(
+        task_id="force_merge_elastic_index",
+        provide_context=True,
+        python_callable=force_merge_elastic_index,
+    )
+
+    restore_elastic_index_settings = PythonOperator(
+        task_id="restore_elastic_index_settings",
+        provide_context=True,
+        python_callable=restore_elastic_index_settings,
+    )
+
+    warm_up_elastic_index = PythonOperator(
+        task_id="warm_up_elastic_index",
+        provide_context=True,
+        python_callable=warm_up_elastic_index,
+    )
+
+    check_search_latency = PythonOperator(
+        task_id="check_search_latency",
+        provide_context=True,
+        python_callable=check_search_latency,
+    )
+
     update_elastic_alias = PythonOperator(
         task_id="update_elastic_alias",
         provide_context=True,
@@ -152,7 +181,11 @@ with DAG(
     create_elastic_index.set_upstream(get_latest_sqlite_database)
     fill_elastic_siren_index.set_upstream(create_elastic_index)
     check_elastic_index.set_upstream(fill_elastic_siren_index)
-    update_elastic_alias.set_upstream(check_elastic_index)
+    force_merge_elastic_index.set_upstream(check_elastic_index)
+    restore_elastic_index_settings.set_upstream(force_merge_elastic_index)
+    warm_up_elastic_index.set_upstream(restore_elastic_index_settings)
+    check_search_latency.set_upstream(warm_up_elastic_index)
+    update_elastic_alias.set_upstream(check_search_latency)
 
     create_sitemap.set_upstream(update_elastic_alias)
     update_sitemap.set_upstream(create_sitemap)
@@ -177,10 +210,10 @@ with DAG(
         clean_folder.set_upstream([test_api, update_sitemap])
         send_notification_tchap.set_upstream([clean_folder, update_sitemap])
     else:
-        flush_cache = PythonOperator(
-            task_id="flush_cache",
+        update_cache_version = PythonOperator(
+            task_id="update_cache_version",
             provide_context=True,
-            python_callable=flush_cache,
+            python_callable=update_cache_version,
             op_args=(
                 REDIS_HOST,
                 REDIS_PORT,
@@ -188,6 +221,11 @@ with DAG(
                 REDIS_PASSWORD,
             ),
         )
+        execute_slow_requests = PythonOperator(
+            task_id="execute_slow_requests",
+            provide_context=True,
+            python_callable=execute_slow_requests,
+        )
         clean_folder = CleanFolderOperator(
             task_id="clean_folder",
             folder_path=f"{AIRFLOW_DAG_TMP}{AIRFLOW_DAG_FOLDER}{AIRFLOW_ELK_DAG_NAME}",
@@ -195,4 +233,5 @@ with DAG(
         sync_data_source_updates.set_upstream(update_elastic_alias)
         test_api.set_upstream(sync_data_source_updates)
         clean_folder.set_upstream([test_api, update_sitemap])
-        flush_cache.set_upstream(clean_folder)
+        update_cache_version.set_upstream(clean_folder)
+        execute_slow_requests.set_upstream(update_cache_version)
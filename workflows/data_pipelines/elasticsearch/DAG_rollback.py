@@ -4,13 +4,19 @@ from airflow.models import DAG
 from airflow.operators.python import PythonOperator
 
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.snapshot import (
+    check_rollback_target,
     rollback_minio_current_index_version,
 )
 
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.downstream import (
+    rollback_downstream_aliases,
     wait_for_downstream_rollback_import,
 )
 
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.index import (
+    rollback_elastic_index,
+)
+
 from dag_datalake_sirene.config import (
     EMAIL_LIST,
     AIRFLOW_SNAPSHOT_ROLLBACK_DAG_NAME,
@@ -35,16 +41,37 @@ with DAG(
     catchup=False,  # False to ignore past runs
     max_active_runs=1,
 ) as dag:
+    check_rollback_target = PythonOperator(
+        task_id="check_rollback_target",
+        provide_context=True,
+        python_callable=check_rollback_target,
+    )
+
+    rollback_elastic_index = PythonOperator(
+        task_id="rollback_elastic_index",
+        provide_context=True,
+        python_callable=rollback_elastic_index,
+    )
+
     rollback_minio_file = PythonOperator(
         task_id="rollback_minio_current_index_version",
         provide_context=True,
         python_callable=rollback_minio_current_index_version,
     )
 
+    rollback_downstream_aliases = PythonOperator(
+        task_id="rollback_downstream_aliases",
+        provide_context=True,
+        python_callable=rollback_downstream_aliases,
+    )
+
     wait_for_downstream = PythonOperator(
         task_id="wait_for_downstream_rollback_import",
         provide_context=True,
         python_callable=wait_for_downstream_rollback_import,
     )
 
-    wait_for_downstream.set_upstream(rollback_minio_file)
+    rollback_elastic_index.set_upstream(check_rollback_target)
+    rollback_minio_file.set_upstream(rollback_elastic_index)
+    rollback_downstream_aliases.set_upstream(rollback_minio_file)
+    wait_for_downstream.set_upstream(rollback_downstream_aliases)
@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+import orjson
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from elasticsearch import ConnectionError as ElasticConnectionError, TransportError
+
+# Documents rejected by Elasticsearch, or whose request failed on a transient error,
+# are sent again after an exponential backoff
+BULK_MAX_RETRIES = 8
+# Too many requests, and the errors of a proxy or a node which is restarting
+BULK_RETRY_STATUSES = {429, 502, 503, 504}
+BULK_INITIAL_BACKOFF = 2  # seconds
+BULK_MAX_BACKOFF = 60  # seconds
+# Bulk requests slower than this are considered as a sign of an overloaded cluster
+BULK_TARGET_LATENCY = 10  # seconds
+BULK_MIN_CHUNK_SIZE = 100
+
+
+class AdaptiveBulkSender:
+    """
+    Send serialized documents to Elasticsearch in concurrent bulk requests
+    :param elastic_connection: elasticsearch client
+    :param max_thread_count: maximum number of concurrent bulk requests
+    :type max_thread_count: int
+    :param max_chunk_size: maximum number of documents per bulk request
+    :type max_chunk_size: int
+    :param max_chunk_bytes: maximum size in bytes of a bulk request
+    :type max_chunk_bytes: int
+
+    The number of concurrent requests and their size start at their maximum, are
+    halved when Elasticsearch rejects documents (429
+    `es_rejected_execution_exception`) or a request fails on a transient error
+    (`BULK_RETRY_STATUSES`, connection error or timeout), reduced when requests get
+    slower than `BULK_TARGET_LATENCY`, and increased back step by step while the
+    cluster keeps up. Rejected documents are retried, and only reported as failed
+    after `BULK_MAX_RETRIES` attempts. Any other error of a whole request (e.g. 400
+    or 401) is raised.
+
+    The number, size and cumulated time of the bulk requests are kept in `metrics`.
+    """
+
+    def __init__(
+        self,
+        elastic_connection,
+        max_thread_count,
+        max_chunk_size,
+        max_chunk_bytes,
+    ):
+        self.elastic_connection = elastic_connection
+        self.max_thread_count = max_thread_count
+        self.max_chunk_size = max_chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+
+        self.thread_count = max_thread_count
+        self.chunk_size = max_chunk_size
+        self.healthy_responses = 0
+        self.lock = threading.Lock()
+        self.metrics = Counter()
+
+    def bulk(self, serialized_actions):
+        """Send the (action line, source line) pairs, and yield a (success, item)
+        tuple for each document, as the bulk helpers do."""
+        with ThreadPoolExecutor(max_workers=self.max_thread_count) as executor:
+            futures = set()
+            for chunk in self.get_chunks(serialized_actions):
+                # Wait for a free slot among the currently allowed bulk requests
+                while len(futures) >= self.thread_count:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+                futures.add(executor.submit(self.send_chunk, chunk))
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+    def get_chunks(self, serialized_actions):
+        chunk = []
+        chunk_bytes = 0
+        for action_line, source_line in serialized_actions:
+            # +2 to account for the trailing new line characters
+            action_bytes = len(action_line) + len(source_line) + 2
+            if chunk and (
+                len(chunk) >= self.chunk_size
+                or chunk_bytes + action_bytes > self.max_chunk_bytes
+            ):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+            chunk.append((action_line, source_line))
+            chunk_bytes += action_bytes
+        if chunk:
+            yield chunk
+
+    def send_chunk(self, chunk):
+        results = []
+        error_status = 429
+        error = f"Rejected {BULK_MAX_RETRIES + 1} times"
+        for attempt in range(BULK_MAX_RETRIES + 1):
+            if attempt > 0:
+                time.sleep(
+                    min(BULK_MAX_BACKOFF, BULK_INITIAL_BACKOFF * 2 ** (attempt - 1))
+                )
+
+            body = b"".join(line + b"\n" for lines in chunk for line in lines)
+            start = time.monotonic()
+            try:
+                response = self.elastic_connection.bulk(body=body)
+            except TransportError as e:
+                # The whole request failed, every document is retried
+                if e.status_code not in BULK_RETRY_STATUSES and not isinstance(
+                    e, ElasticConnectionError
+                ):
+                    raise
+                self.add_metrics(len(body), time.monotonic() - start)
+                self.on_rejection(len(chunk))
+                error_status = e.status_code
+                error = f"Failed {BULK_MAX_RETRIES + 1} times, last error: {e}"
+                continue
+            latency = time.monotonic() - start
+            self.add_metrics(len(body), latency)
+
+            rejected = []
+            for serialized_action, item in zip(chunk, response["items"]):
+                if item["index"]["status"] in BULK_RETRY_STATUSES:
+                    rejected.append(serialized_action)
+                    error_status = item["index"]["status"]
+                    error = f"Rejected {BULK_MAX_RETRIES + 1} times"
+                else:
+                    results.append((200 <= item["index"]["status"] < 300, item))
+
+            if rejected:
+                self.on_rejection(len(rejected))
+            else:
+                self.on_response(latency)
+
+            chunk = rejected
+            if not chunk:
+                return results
+
+        for action_line, _ in chunk:
+            results.append(
+                (
+                    False,
+                    {
+                        "index": {
+                            **orjson.loads(action_line)["index"],
+                            "status": error_status,
+                            "error": error,
+                        }
+                    },
+                )
+            )
+        return results
+
+    def add_metrics(self, body_bytes, latency):
+        with self.lock:
+            self.metrics["bulk_requests"] += 1
+            self.metrics["bulk_bytes"] += body_bytes
+            self.metrics["bulk_time"] += latency
+
+    def on_rejection(self, rejected_count):
+        with self.lock:
+            self.healthy_responses = 0
+            self.thread_count = max(1, self.thread_count // 2)
+            self.chunk_size = max(BULK_MIN_CHUNK_SIZE, self.chunk_size // 2)
+            logging.warning(
+                f"{rejected_count} documents rejected by Elasticsearch, "
+                f"throttling to {self.thread_count} threads "
+                f"and {self.chunk_size} documents per request"
+            )
+
+    def on_response(self, latency):
+        with self.lock:
+            if latency > BULK_TARGET_LATENCY:
+                self.healthy_responses = 0
+                self.chunk_size = max(BULK_MIN_CHUNK_SIZE, self.chunk_size * 3 // 4)
+                logging.info(
+                    f"Bulk request took {latency:.1f}s, "
+                    f"reducing to {self.chunk_size} documents per request"
+                )
+                return
+
+            self.healthy_responses += 1
+            self.chunk_size = min(
+                self.max_chunk_size, self.chunk_size + self.max_chunk_size // 10
+            )
+            # One more thread once every current thread got a healthy response
+            if (
+                self.healthy_responses >= self.thread_count
+                and self.thread_count < self.max_thread_count
+            ):
+                self.healthy_responses = 0
+                self.thread_count += 1
+                logging.info(f"Increasing to {self.thread_count} bulk threads")
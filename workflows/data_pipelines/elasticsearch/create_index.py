@@ -4,6 +4,7 @@ from elasticsearch_dsl import Index, connections
 
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
     StructureMapping,
+    bulk_load_settings,
 )
 
 
@@ -74,3 +75,8 @@ class ElasticCreateIndex:
         logging.info(f"Creating {self.elastic_index} index!")
         # Create the mapping in elasticsearch
         StructureMapping.init(index=self.elastic_index)
+        # The index is loaded with its bulk load settings, restored to their read time
+        # values by `restore_elastic_index_settings`
+        self.elastic_connection.indices.put_settings(
+            index=self.elastic_index, body=bulk_load_settings
+        )
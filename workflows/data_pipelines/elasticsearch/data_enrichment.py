@@ -1,5 +1,6 @@
 import json
 import logging
+import pandas as pd
 from slugify import slugify
 
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.clean_data import (
@@ -19,6 +20,7 @@ from dag_datalake_sirene.helpers.utils import (
 )
 from dag_datalake_sirene.helpers.geolocalisation import (
     transform_coordinates,
+    transform_coordinates_batch,
 )
 
 labels_file_path = "dags/dag_datalake_sirene/helpers/labels/"
@@ -56,6 +58,24 @@ def format_nom_complet(
     return name.upper().strip() if name else name
 
 
+def format_nom_complet_column(nom, nom_usage, nom_raison_sociale, prenom):
+    """`format_nom_complet` for pandas Series of values."""
+    nom, nom_usage, nom_raison_sociale, prenom = (
+        column.fillna("") for column in (nom, nom_usage, nom_raison_sociale, prenom)
+    )
+    formatted_name = pd.Series("", index=nom.index)
+    formatted_name = formatted_name.mask(nom != "", " " + nom)
+    formatted_name = formatted_name.mask(nom_usage != "", " " + nom_usage)
+    formatted_name = formatted_name.mask(
+        (nom_usage != "") & (nom != ""), " " + nom_usage + " (" + nom + ")"
+    )
+    name = (prenom + formatted_name).where(
+        (prenom != "") | (nom != "") | (nom_usage != "")
+    )
+    name = nom_raison_sociale.where(nom_raison_sociale != "", name)
+    return name.str.upper().str.strip()
+
+
 def get_nom_commercial(unite_legale):
     siege = unite_legale.get("siege", None)
     if siege is not None:
@@ -125,6 +145,69 @@ def format_slug(
     return slugify(full_name) if full_name else ""
 
 
+def join_non_empty_columns(*columns):
+    """Join the non empty strings of each row with a space, for pandas Series of
+    strings."""
+    joined = pd.Series("", index=columns[0].index)
+    for column in columns:
+        joined = joined + (" " + column).where(column != "", "")
+    # Remove the space before the first string
+    return joined.str[1:]
+
+
+def format_slug_column(
+    nom_complet,
+    sigle,
+    nom_commercial_siege,
+    denomination_usuelle_1,
+    denomination_usuelle_2,
+    denomination_usuelle_3,
+    siren,
+    statut_diffusion,
+):
+    """`format_slug` for pandas Series of values. Only the strings are built column
+    by column, each full name still goes through `slugify`."""
+    (
+        nom_complet,
+        sigle,
+        nom_commercial_siege,
+        denomination_usuelle_1,
+        denomination_usuelle_2,
+        denomination_usuelle_3,
+        siren,
+    ) = (
+        column.fillna("")
+        for column in (
+            nom_complet,
+            sigle,
+            nom_commercial_siege,
+            denomination_usuelle_1,
+            denomination_usuelle_2,
+            denomination_usuelle_3,
+            siren,
+        )
+    )
+    denomination_usuelle = join_non_empty_columns(
+        *(
+            column.where(column != "SUPPRESSION DU NOM COMMERCIAL", "")
+            for column in (
+                denomination_usuelle_1,
+                denomination_usuelle_2,
+                denomination_usuelle_3,
+            )
+        )
+    )
+    full_name = join_non_empty_columns(
+        nom_complet,
+        nom_commercial_siege.where(nom_commercial_siege != "", denomination_usuelle),
+        sigle,
+        siren,
+    ).str.lower()
+    # Private companies get their siren as slug
+    full_name = siren.where((statut_diffusion == "P") & (siren != ""), full_name)
+    return full_name.map(lambda name: slugify(name) if name else "")
+
+
 # Noms
 def format_nom(
     nom=None,
@@ -472,20 +555,9 @@ def format_etablissements_and_complements(
         etablissement["region"] = label_region_from_departement(
             etablissement["departement"]
         )
-        if etablissement["latitude"] is None or etablissement["longitude"] is None:
-            etablissement["latitude"], etablissement["longitude"] = (
-                transform_coordinates(
-                    etablissement["departement"],
-                    etablissement["x"],
-                    etablissement["y"],
-                )
-            )
         etablissement["ancien_siege"] = sqlite_str_to_bool(
             etablissement["ancien_siege"]
         )
-        etablissement["coordonnees"] = format_coordonnees(
-            etablissement["longitude"], etablissement["latitude"]
-        )
         etablissement["epci"] = label_epci_from_commune(etablissement["commune"])
         etablissement["est_siege"] = str_to_bool(etablissement["est_siege"])
         etablissement["liste_idcc"] = str_to_list(etablissement["liste_idcc"])
@@ -506,6 +578,38 @@ def format_etablissements_and_complements(
             if etablissement[field]:
                 complements[get_elasticsearch_field_name(field)] = True
 
+    # Coordinates of the établissements without latitude and longitude, computed
+    # in a single batch
+    etablissements_without_coordinates = [
+        etablissement
+        for etablissement in etablissements_processed
+        if etablissement["latitude"] is None or etablissement["longitude"] is None
+    ]
+    if etablissements_without_coordinates:
+        latitudes, longitudes = transform_coordinates_batch(
+            [
+                etablissement["departement"]
+                for etablissement in etablissements_without_coordinates
+            ],
+            [
+                etablissement["x"]
+                for etablissement in etablissements_without_coordinates
+            ],
+            [
+                etablissement["y"]
+                for etablissement in etablissements_without_coordinates
+            ],
+        )
+        for etablissement, latitude, longitude in zip(
+            etablissements_without_coordinates, latitudes, longitudes
+        ):
+            etablissement["latitude"] = latitude
+            etablissement["longitude"] = longitude
+    for etablissement in etablissements_processed:
+        etablissement["coordonnees"] = format_coordonnees(
+            etablissement["longitude"], etablissement["latitude"]
+        )
+
     return etablissements_processed, complements
 
 
@@ -0,0 +1,108 @@
+import logging
+
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
+    StructureMapping,
+)
+
+# Both APIs read every segment of the index, which takes a while on a large one
+FIELD_AUDIT_REQUEST_TIMEOUT = 3600  # seconds
+FIELD_AUDIT_DISK_USAGE_KEYS = [
+    "inverted_index",
+    "stored_fields",
+    "doc_values",
+    "points",
+    "norms",
+]
+
+
+def get_mapping_fields(properties=None, prefix=""):
+    """Full path of every field declared in `StructureMapping`, including the fields
+    of the nested documents (établissements, dirigeants...) and the multi-fields
+    (e.g. `nom_complet.keyword`)."""
+    if properties is None:
+        properties = StructureMapping._doc_type.mapping.to_dict()["properties"]
+    fields = []
+    for name, field in sorted(properties.items()):
+        path = f"{prefix}{name}"
+        if "properties" in field:
+            fields.extend(get_mapping_fields(field["properties"], f"{path}."))
+            continue
+        fields.append(path)
+        for multi_field in sorted(field.get("fields", {})):
+            fields.append(f"{path}.{multi_field}")
+    return fields
+
+
+def get_field_disk_usage(elastic_connection, elastic_index):
+    """Bytes used by each field of `elastic_index`, in total and per data
+    structure."""
+    response = elastic_connection.indices.disk_usage(
+        index=elastic_index,
+        run_expensive_tasks=True,
+        request_timeout=FIELD_AUDIT_REQUEST_TIMEOUT,
+    )
+    disk_usage = {}
+    for field, usage in response[elastic_index]["fields"].items():
+        disk_usage[field] = {"total": usage["total_in_bytes"]}
+        for key in FIELD_AUDIT_DISK_USAGE_KEYS:
+            value = usage.get(f"{key}_in_bytes", usage.get(key))
+            if isinstance(value, dict):
+                value = value["total_in_bytes"]
+            disk_usage[field][key] = value or 0
+    return disk_usage
+
+
+def get_field_usage(elastic_connection, elastic_index):
+    """Number of searches which used each field of `elastic_index` since its shards
+    were opened, summed over the shards."""
+    response = elastic_connection.indices.field_usage_stats(
+        index=elastic_index, request_timeout=FIELD_AUDIT_REQUEST_TIMEOUT
+    )
+    field_usage = {}
+    for shard in response[elastic_index]["shards"]:
+        for field, usage in shard["stats"]["fields"].items():
+            field_usage[field] = field_usage.get(field, 0) + usage["any"]
+    return field_usage
+
+
+def audit_index_fields(elastic_connection, elastic_index):
+    """
+    Storage and query usage of each field declared in the mapping, biggest first.
+
+    Fields which take space in the index but are never searched are candidates for
+    a leaner mapping in `mapping_index.py` (e.g. `index=False`, `doc_values=False`
+    or `norms=False`), once the report covers every kind of API query.
+    """
+    disk_usage = get_field_disk_usage(elastic_connection, elastic_index)
+    field_usage = get_field_usage(elastic_connection, elastic_index)
+
+    report = []
+    for field in get_mapping_fields():
+        usage = disk_usage.get(field, {"total": 0})
+        report.append(
+            {
+                "field": field,
+                **usage,
+                "searches": field_usage.get(field, 0),
+            }
+        )
+    report.sort(key=lambda row: -row["total"])
+
+    for row in report:
+        details = ", ".join(
+            f"{key} {row[key]}" for key in FIELD_AUDIT_DISK_USAGE_KEYS if row.get(key)
+        )
+        logging.info(
+            f"{row['field']}: {row['total']} bytes ({details}), "
+            f"{row['searches']} searches"
+        )
+    unused_bytes = sum(
+        row.get("inverted_index", 0) + row.get("doc_values", 0) + row.get("norms", 0)
+        for row in report
+        if not row["searches"]
+    )
+    logging.info(
+        f"******* {unused_bytes} bytes of inverted indexes, doc values and norms "
+        f"belong to fields never searched in {elastic_index}"
+    )
+    return report
@@ -0,0 +1,115 @@
+import logging
+import time
+from collections import deque
+
+# Seconds between two saves of the checkpoint while indexing
+CHECKPOINT_INTERVAL = 60
+
+
+class IndexingCheckpoint:
+    """
+    Progress of the indexing of an Elasticsearch index, saved through a `Filesystem`
+    so that a retry of the task resumes the indexing into the same index.
+
+    The unités légales are indexed by units of work, each one covering the sirens in
+    (siren_after, siren_until]. The `siren_after` of a unit is moved forward to the
+    last siren whose documents, and all the previous ones of the unit, were
+    acknowledged by Elasticsearch: a retry resumes the unit from there.
+
+    :param filesystem: where the checkpoint is saved
+    :type filesystem: Filesystem
+    :param checkpoint_name: name of the checkpoint, unique for an index
+    :type checkpoint_name: str
+    """
+
+    def __init__(self, filesystem, checkpoint_name):
+        self.filesystem = filesystem
+        self.filename = f"{checkpoint_name}.json"
+
+        self.units = []
+        # Whether the indexing was resumed from a previous attempt
+        self.resumed = False
+        self.doc_count = 0
+        self.failed_doc_count = 0
+
+        # Chunks of documents sent to Elasticsearch, by unit, in siren order
+        self.pending_chunks = {}
+        self.pending_chunk_by_document_id = {}
+        self.last_save = time.monotonic()
+
+    def load(self, siren_bounds):
+        """Resume from the saved checkpoint if any, otherwise start with a unit of
+        work for each (siren_after, siren_until] of `siren_bounds`.
+
+        Return the (index, unit) of the units left to index."""
+        content = self.filesystem.read(self.filename)
+        if content is None:
+            self.units = [
+                {"siren_after": siren_after, "siren_until": siren_until, "done": False}
+                for siren_after, siren_until in siren_bounds
+            ]
+        else:
+            self.resumed = True
+            self.units = content["units"]
+            self.doc_count = content["doc_count"]
+            self.failed_doc_count = content["failed_doc_count"]
+            logging.info(
+                f"Resuming indexing from {self.filename}: "
+                f"{sum(unit['done'] for unit in self.units)}/{len(self.units)} "
+                f"units done, {self.doc_count} documents indexed"
+            )
+        return [
+            (index, unit) for index, unit in enumerate(self.units) if not unit["done"]
+        ]
+
+    def add_chunk(self, unit_index, last_siren, end_of_unit, document_ids):
+        """Register a chunk of documents of a unit, before they are sent."""
+        chunk = {
+            "unit_index": unit_index,
+            "last_siren": last_siren,
+            "end_of_unit": end_of_unit,
+            "pending": len(document_ids),
+        }
+        self.pending_chunks.setdefault(unit_index, deque()).append(chunk)
+        for document_id in document_ids:
+            self.pending_chunk_by_document_id[document_id] = chunk
+        if not document_ids:
+            self.move_forward(unit_index)
+
+    def acknowledge(self, document_id, success):
+        if success:
+            self.doc_count += 1
+        else:
+            self.failed_doc_count += 1
+
+        chunk = self.pending_chunk_by_document_id.pop(document_id)
+        chunk["pending"] -= 1
+        if chunk["pending"] == 0:
+            self.move_forward(chunk["unit_index"])
+
+        if time.monotonic() - self.last_save > CHECKPOINT_INTERVAL:
+            self.save()
+
+    def move_forward(self, unit_index):
+        chunks = self.pending_chunks[unit_index]
+        unit = self.units[unit_index]
+        while chunks and chunks[0]["pending"] == 0:
+            chunk = chunks.popleft()
+            if chunk["last_siren"] is not None:
+                unit["siren_after"] = chunk["last_siren"]
+            if chunk["end_of_unit"]:
+                unit["done"] = True
+
+    def save(self):
+        self.filesystem.write(
+            self.filename,
+            {
+                "units": self.units,
+                "doc_count": self.doc_count,
+                "failed_doc_count": self.failed_doc_count,
+            },
+        )
+        self.last_save = time.monotonic()
+
+    def delete(self):
+        self.filesystem.delete(self.filename)
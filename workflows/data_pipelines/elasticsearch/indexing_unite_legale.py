@@ -1,133 +1,559 @@
+import bisect
+import hashlib
+import json
 import logging
+import multiprocessing
+import queue
+import resource
+import threading
 import time
-from elasticsearch.helpers import parallel_bulk
+from collections import Counter
+import orjson
+from elasticsearch.serializer import JSONSerializer
 
-from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
-    StructureMapping,
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_READ_MODE,
+    SqliteClient,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.bulk_sender import (
+    AdaptiveBulkSender,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sitemap_writer import (
+    format_sitemap_line,
+    is_in_sitemap,
 )
 
 # fmt: off
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch\
     .process_unites_legales import process_unites_legales
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sqlite.\
+    fields_to_index import (
+    select_fields_to_index_by_siren_range_query,
+    select_fields_to_index_by_sirens_query,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sqlite.\
+    changed_sirens import (
+    additional_data_tables,
+    get_fingerprint_key,
+    get_update_date_key,
+    select_changed_sirens_query,
+    select_last_update_date_query,
+    select_table_content_query,
+    update_date_columns,
+)
 # fmt: on
 
+# Each worker gets several siren ranges, so that a worker done with a sparse range
+# picks up the next one instead of staying idle
+SIREN_RANGES_PER_WORKER = 16
+# Upper bound of the last siren range, sorts after any siren value
+SIREN_RANGE_UPPER_BOUND = chr(0x10FFFF)
+# Number of sirens read by each query, and deleted by each request, in delta mode
+DELTA_SIRENS_BATCH_SIZE = 1000
+
+# Bounded queues between the pipeline stages, in number of chunks: a stage blocks
+# when the next one falls behind (e.g. Elasticsearch slows down)
+ROWS_QUEUE_SIZE = 2
+DOCUMENTS_QUEUE_SIZE_PER_WORKER = 2
+# Seconds to wait for a chunk of documents before checking the workers health
+DOCUMENTS_QUEUE_TIMEOUT = 60
+
+# Values not handled by orjson are serialized as the default serializer of the
+# client does
+serializer = JSONSerializer()
+
 
 def doc_unite_legale_generator(data, elastic_index):
-    # Serialize the instance into a dictionary so that it can be saved in elasticsearch.
-    for index, document in enumerate(data):
-        etablissements_count = len(document["unite_legale"]["etablissements"])
+    """Build the bulk index actions of the processed unités légales.
+
+    The actions are built as plain dicts instead of `StructureMapping` documents,
+    whose `to_dict(include_meta=True)` gives the same result: the mapped fields are
+    left as is, and empty top-level values dropped.
+    """
+    for document in data:
+        unite_legale = document["unite_legale"]
+        etablissements = unite_legale["etablissements"]
+        etablissements_count = len(etablissements)
         # If ` unité légale` had more than 100 `établissements`, the main document is
         # separated into smaller documents consisting of 100 établissements each
         if etablissements_count > 100:
-            smaller_document = document.copy()
-            etablissements = document["unite_legale"]["etablissements"]
-            etablissements_left = etablissements_count
-            etablissements_indexed = 0
-            while etablissements_left > 0:
-                # min is used for the last iteration
-                number_etablissements_to_add = min(etablissements_left, 100)
-                # Select a 100 etablissements from the main document,
-                # and use it as a list for the smaller document
-                smaller_document["unite_legale"]["etablissements"] = etablissements[
-                    etablissements_indexed : etablissements_indexed
-                    + number_etablissements_to_add
-                ]
-                etablissements_left = etablissements_left - 100
-                etablissements_indexed += 100
-                yield StructureMapping(
-                    meta={
-                        "index": elastic_index,
-                        "id": f"{smaller_document['identifiant']}-"
-                        f"{etablissements_indexed}",
+            for etablissements_indexed in range(100, etablissements_count + 100, 100):
+                # Each smaller document gets its own copy of the unité légale, only
+                # the list of établissements differs
+                smaller_document = {
+                    **document,
+                    "unite_legale": {
+                        **unite_legale,
+                        "etablissements": etablissements[
+                            etablissements_indexed - 100 : etablissements_indexed
+                        ],
                     },
-                    **smaller_document,
-                ).to_dict(include_meta=True)
+                }
+                yield get_bulk_action(
+                    smaller_document,
+                    elastic_index,
+                    f"{document['identifiant']}-{etablissements_indexed}",
+                )
         # Otherwise, (the document has less than 100 établissements), index document
         # as is
         else:
-            yield StructureMapping(
-                meta={
-                    "index": elastic_index,
-                    "id": f"{document['identifiant']}-100",
-                },
-                **document,
-            ).to_dict(include_meta=True)
+            yield get_bulk_action(
+                document, elastic_index, f"{document['identifiant']}-100"
+            )
+
+
+def get_bulk_action(document, elastic_index, document_id):
+    source = {}
+    for key, value in document.items():
+        if isinstance(value, tuple):
+            value = list(value)
+        # Empty values are not indexed, careful not to drop numeric zeros
+        if value not in ([], {}, None):
+            source[key] = value
+    return {"_id": document_id, "_index": elastic_index, "_source": source}
+
+
+def serialize_bulk_action(action):
+    """Serialize an action into the UTF-8 encoded action and source lines of the bulk
+    request, as the bulk helpers would do, so that it is done by the indexing
+    workers. orjson gives the same output as the default serializer, faster."""
+    return (
+        orjson.dumps({"index": {"_id": action["_id"], "_index": action["_index"]}}),
+        orjson.dumps(action["_source"], default=serializer.default),
+    )
+
+
+def get_siren_ranges(range_count):
+    """Split the siren key space into `range_count` (siren_after, siren_until]
+    ranges."""
+    bounds = [f"{i * 10**9 // range_count:09d}" for i in range(1, range_count)]
+    bounds = ["", *bounds, SIREN_RANGE_UPPER_BOUND]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def get_siren_batches(sirens):
+    """Split the changed sirens into batches read, or deleted, by a single query."""
+    return [
+        sirens[i : i + DELTA_SIRENS_BATCH_SIZE]
+        for i in range(0, len(sirens), DELTA_SIRENS_BATCH_SIZE)
+    ]
+
+
+def get_siren_batch_ranges(sirens):
+    """(siren_after, siren_until] ranges of the batches of the sorted `sirens`."""
+    batches_last_sirens = [siren_batch[-1] for siren_batch in get_siren_batches(sirens)]
+    return list(zip(["", *batches_last_sirens[:-1]], batches_last_sirens))
+
+
+def get_sirens_in_range(sirens, siren_after, siren_until):
+    return sirens[
+        bisect.bisect_right(sirens, siren_after) : bisect.bisect_right(
+            sirens, siren_until
+        )
+    ]
+
+
+def get_additional_data_fingerprints(sqlite_db_location):
+    """Hash of the content of each additional data table, see `changed_sirens`."""
+    sqlite_client = SqliteClient(sqlite_db_location, mode=SQLITE_READ_MODE)
+    fingerprints = {}
+    for table in additional_data_tables:
+        fingerprint = hashlib.blake2b()
+        for row in sqlite_client.execute(select_table_content_query(table)):
+            fingerprint.update(repr(row).encode())
+        fingerprints[get_fingerprint_key(table)] = fingerprint.hexdigest()
+    sqlite_client.commit_and_close_conn()
+    return fingerprints
+
+
+def get_changed_additional_data(last_update_dates, fingerprints):
+    """Additional data tables whose content differs from the one indexed with
+    `last_update_dates`."""
+    return [
+        key.split(".")[0]
+        for key, fingerprint in fingerprints.items()
+        if last_update_dates.get(key) != fingerprint
+    ]
+
+
+def get_last_update_dates(sqlite_db_location):
+    """Last update date of each source of the indexed data, and fingerprint of each
+    additional data table, see `changed_sirens`."""
+    sqlite_client = SqliteClient(sqlite_db_location, mode=SQLITE_READ_MODE)
+    last_update_dates = {
+        get_update_date_key(table, column): sqlite_client.execute(
+            select_last_update_date_query(table, column)
+        ).fetchone()[0]
+        for table, column in update_date_columns
+    }
+    sqlite_client.commit_and_close_conn()
+    last_update_dates.update(get_additional_data_fingerprints(sqlite_db_location))
+    return last_update_dates
+
+
+def get_changed_sirens(sqlite_db_location, last_update_dates):
+    sqlite_client = SqliteClient(sqlite_db_location, mode=SQLITE_READ_MODE)
+    sirens = sorted(
+        siren
+        for (siren,) in sqlite_client.execute(
+            *select_changed_sirens_query(last_update_dates)
+        )
+    )
+    sqlite_client.commit_and_close_conn()
+    return sirens
+
+
+def delete_unites_legales(elastic_connection, elastic_index, sirens):
+    """Delete every document of the given sirens: an unité légale may be split into
+    a different number of documents, or be removed from the database."""
+    deleted_doc_count = 0
+    for siren_batch in get_siren_batches(sirens):
+        response = elastic_connection.delete_by_query(
+            index=elastic_index,
+            body={"query": {"terms": {"identifiant": siren_batch}}},
+            conflicts="proceed",
+        )
+        deleted_doc_count += response["deleted"]
+    logging.info(f"Number of documents deleted: {deleted_doc_count}")
+
+
+def read_unites_legales(
+    sqlite_db_location,
+    queries_queue,
+    rows_queue,
+    elastic_bulk_size,
+    metrics,
+):
+    """Reader stage: fetch the unités légales of each unit of work by chunk, followed
+    by an empty chunk marking the end of the unit."""
+    try:
+        # The SQLite connection is opened in the reader thread which uses it
+        sqlite_client = SqliteClient(sqlite_db_location, mode=SQLITE_READ_MODE)
+        while (unit := queries_queue.get()) is not None:
+            unit_index, query, params = unit
+            start = time.monotonic()
+            cursor = sqlite_client.execute(query, params)
+            unite_legale_columns = tuple([x[0] for x in cursor.description])
+            while chunk_unites_legales_sqlite := cursor.fetchmany(elastic_bulk_size):
+                metrics["sqlite_fetch_time"] += time.monotonic() - start
+                metrics["unites_legales"] += len(chunk_unites_legales_sqlite)
+                rows_queue.put(
+                    (unit_index, unite_legale_columns, chunk_unites_legales_sqlite)
+                )
+                start = time.monotonic()
+            metrics["sqlite_fetch_time"] += time.monotonic() - start
+            rows_queue.put((unit_index, unite_legale_columns, []))
+        sqlite_client.commit_and_close_conn()
+    except Exception as e:
+        rows_queue.put(e)
+    finally:
+        rows_queue.put(None)
+
+
+def transform_unites_legales(
+    sqlite_db_location,
+    queries_queue,
+    documents_queue,
+    elastic_bulk_size,
+    elastic_index,
+    with_sitemap,
+):
+    """Transformer stage, run by each worker process: build the documents of the
+    chunks read by its own reader thread and hand them over to the senders, with
+    the unit of work, last siren and document ids of the chunk, and the sitemap
+    lines of the chunk if `with_sitemap`.
+
+    The time spent in each stage is sent to the senders as the last message."""
+    metrics = Counter()
+    rows_queue = queue.Queue(maxsize=ROWS_QUEUE_SIZE)
+    reader = threading.Thread(
+        target=read_unites_legales,
+        args=(
+            sqlite_db_location,
+            queries_queue,
+            rows_queue,
+            elastic_bulk_size,
+            metrics,
+        ),
+        daemon=True,
+    )
+    reader.start()
+    try:
+        while (chunk := rows_queue.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            unit_index, unite_legale_columns, chunk_unites_legales_sqlite = chunk
+            if not chunk_unites_legales_sqlite:
+                documents_queue.put((unit_index, None, True, [], [], []))
+                continue
+            start = time.monotonic()
+            # Group all fetched unites_legales from sqlite in one list
+            liste_unites_legales_sqlite = tuple(
+                dict(zip(unite_legale_columns, unite_legale))
+                for unite_legale in chunk_unites_legales_sqlite
+            )
+            chunk_unites_legales_processed = process_unites_legales(
+                liste_unites_legales_sqlite
+            )
+            metrics["process_time"] += time.monotonic() - start
+
+            start = time.monotonic()
+            actions = list(
+                doc_unite_legale_generator(
+                    chunk_unites_legales_processed, elastic_index
+                )
+            )
+            serialized_actions = [serialize_bulk_action(action) for action in actions]
+            metrics["serialization_time"] += time.monotonic() - start
+
+            sitemap_lines = (
+                get_sitemap_lines(chunk_unites_legales_processed)
+                if with_sitemap
+                else []
+            )
+
+            documents_queue.put(
+                (
+                    unit_index,
+                    liste_unites_legales_sqlite[-1]["siren"],
+                    False,
+                    [action["_id"] for action in actions],
+                    serialized_actions,
+                    sitemap_lines,
+                )
+            )
+    except Exception as e:
+        logging.error(f"Failed to process unités légales: {e}")
+        documents_queue.put(e)
+    finally:
+        documents_queue.put(dict(metrics))
+
+
+def get_sitemap_lines(unites_legales_processed):
+    """Sitemap lines of the unités légales, with the slug used by the API."""
+    return [
+        format_sitemap_line(
+            unite_legale["siege"]["code_postal"],
+            unite_legale["activite_principale_unite_legale"],
+            unite_legale["slug"],
+        )
+        for document in unites_legales_processed
+        if (unite_legale := document["unite_legale"])["siege"]
+        and is_in_sitemap(unite_legale)
+    ]
+
+
+def documents_from_queue(
+    documents_queue, workers, checkpoint, metrics, sitemap_writer=None
+):
+    """Yield the documents built by the workers until all of them are done, add
+    up their metrics and write their sitemap lines."""
+    running_workers = len(workers)
+    while running_workers:
+        try:
+            documents = documents_queue.get(timeout=DOCUMENTS_QUEUE_TIMEOUT)
+        except queue.Empty:
+            if any(worker.exitcode for worker in workers):
+                raise Exception("An indexing worker process died unexpectedly")
+            continue
+        if isinstance(documents, dict):
+            running_workers -= 1
+            metrics.update(documents)
+        elif isinstance(documents, Exception):
+            raise documents
+        else:
+            (
+                unit_index,
+                last_siren,
+                end_of_unit,
+                document_ids,
+                serialized_actions,
+                sitemap_lines,
+            ) = documents
+            checkpoint.add_chunk(unit_index, last_siren, end_of_unit, document_ids)
+            if sitemap_writer is not None:
+                sitemap_writer.write(sitemap_lines)
+            yield from serialized_actions
+
+
+def get_indexing_metrics(metrics, doc_count, duration):
+    """
+    Metrics of an indexing run, to find out which stage slows it down. Times are
+    in seconds, summed over the workers or the concurrent bulk requests, sizes in
+    bytes:
+    * sqlite_fetch_time: reading the unités légales from SQLite
+    * process_time: `process_unites_legales`
+    * serialization_time: building and serializing the documents
+    * bulk_time: bulk requests round-trips, including the rejected ones
+    * peak_rss: peak memory of the main process, and of the workers
+    """
+    duration = max(duration, 1)
+    return {
+        "duration": round(duration),
+        "documents": doc_count,
+        "unites_legales": metrics["unites_legales"],
+        "documents_per_second": round(doc_count / duration),
+        "bytes_per_second": round(metrics["bulk_bytes"] / duration),
+        "sqlite_fetch_time": round(metrics["sqlite_fetch_time"]),
+        "process_time": round(metrics["process_time"]),
+        "serialization_time": round(metrics["serialization_time"]),
+        "bulk_time": round(metrics["bulk_time"]),
+        "bulk_requests": metrics["bulk_requests"],
+        "bulk_bytes": metrics["bulk_bytes"],
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "workers_peak_rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        * 1024,
+    }
 
 
 def index_unites_legales_by_chunk(
-    cursor,
+    sqlite_db_location,
     elastic_connection,
     elastic_bulk_thread_count,
     elastic_bulk_size,
+    elastic_bulk_max_chunk_bytes,
+    elastic_worker_count,
     elastic_index,
+    checkpoint,
+    sirens=None,
+    sitemap_writer=None,
 ):
-    # Indexing performance : do not refresh the index while indexing
-    elastic_connection.indices.put_settings(
-        index=elastic_index, body={"index.refresh_interval": -1}
-    )
+    """Index all the unités légales, or only the given sorted `sirens` (delta mode)
+    after deleting their current documents.
 
-    logger = 0
-    doc_count = 0
-    chunk_unites_legales_sqlite = 1
-    while chunk_unites_legales_sqlite:
-        chunk_unites_legales_sqlite = cursor.fetchmany(elastic_bulk_size)
-        unite_legale_columns = tuple([x[0] for x in cursor.description])
-        liste_unites_legales_sqlite = []
-        # Group all fetched unites_legales from sqlite in one list
-        for unite_legale in chunk_unites_legales_sqlite:
-            liste_unites_legales_sqlite.append(
-                {
-                    unite_legale_columns: value
-                    for unite_legale_columns, value in zip(
-                        unite_legale_columns, unite_legale
-                    )
-                }
+    The sitemap lines of the indexed unités légales are written to the
+    `SitemapWriter` if any, saving a second scan of the database for the sitemap.
+
+    The progress is saved in the `IndexingCheckpoint`: when called again for the
+    same index, the indexing resumes after the last acknowledged sirens.
+
+    The index is expected to have its bulk load settings, see `mapping_index`.
+
+    Return the number of documents of the index, and the metrics of the indexing,
+    see `get_indexing_metrics`."""
+    start = time.monotonic()
+    metrics = Counter()
+
+    # A single streaming pipeline keeps every stage busy
+    # * each worker process reads its queries in a reader thread, builds and
+    #   serializes the documents (`process_unites_legales` is CPU bound)
+    # * one long-lived `AdaptiveBulkSender` sends the documents to Elasticsearch
+    # Stages are connected by bounded queues, so a slow stage applies backpressure
+    # on the previous ones instead of piling up chunks in memory
+    queries_queue = multiprocessing.Queue()
+    if sirens is None:
+        units = checkpoint.load(
+            get_siren_ranges(elastic_worker_count * SIREN_RANGES_PER_WORKER)
+        )
+        for unit_index, unit in units:
+            queries_queue.put(
+                (
+                    unit_index,
+                    select_fields_to_index_by_siren_range_query,
+                    {
+                        "siren_after": unit["siren_after"],
+                        "siren_until": unit["siren_until"],
+                    },
+                )
+            )
+    else:
+        units = checkpoint.load(get_siren_batch_ranges(sirens))
+        units_sirens = [
+            (
+                unit_index,
+                get_sirens_in_range(sirens, unit["siren_after"], unit["siren_until"]),
             )
+            for unit_index, unit in units
+        ]
+        delete_unites_legales(
+            elastic_connection,
+            elastic_index,
+            [siren for _, unit_sirens in units_sirens for siren in unit_sirens],
+        )
+        for unit_index, unit_sirens in units_sirens:
+            queries_queue.put(
+                (
+                    unit_index,
+                    select_fields_to_index_by_sirens_query,
+                    {"sirens": json.dumps(unit_sirens)},
+                )
+            )
+    for _ in range(elastic_worker_count):
+        queries_queue.put(None)
 
-        liste_unites_legales_sqlite = tuple(liste_unites_legales_sqlite)
+    documents_queue = multiprocessing.Queue(
+        maxsize=elastic_worker_count * DOCUMENTS_QUEUE_SIZE_PER_WORKER
+    )
+    workers = [
+        multiprocessing.Process(
+            target=transform_unites_legales,
+            args=(
+                sqlite_db_location,
+                queries_queue,
+                documents_queue,
+                elastic_bulk_size,
+                elastic_index,
+                sitemap_writer is not None,
+            ),
+            daemon=True,
+        )
+        for _ in range(elastic_worker_count)
+    ]
+    for worker in workers:
+        worker.start()
 
-        chunk_unites_legales_processed = process_unites_legales(
-            liste_unites_legales_sqlite
+    sent_doc_count = 0
+    try:
+        # Bulk index documents into elasticsearch in concurrent requests, throttled
+        # when the cluster is overloaded
+        # Bulk requests are capped both in number of documents and in bytes, as a
+        # document carries up to 100 établissements
+        # Documents rejected, or whose requests failed on a transient error, after
+        # every retry are logged and do not stop the indexing. Any other error of a
+        # bulk request is raised by the sender
+        bulk_sender = AdaptiveBulkSender(
+            elastic_connection,
+            max_thread_count=elastic_bulk_thread_count,
+            max_chunk_size=elastic_bulk_size,
+            max_chunk_bytes=elastic_bulk_max_chunk_bytes,
         )
-        logger += 1
-        if logger % 100000 == 0:
-            logging.info(f"logger={logger}")
-        try:
-            chunk_doc_generator = doc_unite_legale_generator(
-                chunk_unites_legales_processed, elastic_index
+        for success, details in bulk_sender.bulk(
+            documents_from_queue(
+                documents_queue, workers, checkpoint, metrics, sitemap_writer
             )
-            # Bulk index documents into elasticsearch using the parallel version of the
-            # bulk helper that runs in multiple threads
-            # The bulk helper accept an instance of Elasticsearch class and an
-            # iterable, a generator in our case
-            for success, details in parallel_bulk(
-                elastic_connection,
-                chunk_doc_generator,
-                thread_count=elastic_bulk_thread_count,
-                chunk_size=elastic_bulk_size,
-            ):
-                if not success:
-                    raise Exception(f"A file_access document failed: {details}")
-                else:
-                    doc_count += 1
-        except Exception as e:
-            logging.error(f"Failed to send to Elasticsearch: {e}")
-        logging.info(f"Number of documents indexed: {doc_count}")
-
-    # rollback to the original value
-    elastic_connection.indices.put_settings(
-        index=elastic_index, body={"index.refresh_interval": None}
+        ):
+            sent_doc_count += 1
+            checkpoint.acknowledge(details["index"]["_id"], success)
+            if not success:
+                logging.error(f"Failed to send to Elasticsearch: {details}")
+            elif checkpoint.doc_count % 100000 == 0:
+                logging.info(f"Number of documents indexed: {checkpoint.doc_count}")
+    finally:
+        checkpoint.save()
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        # Do not wait for the remaining queries to be sent to the stopped workers
+        queries_queue.cancel_join_thread()
+
+    logging.info(
+        f"Number of documents indexed: {checkpoint.doc_count}, "
+        f"failed: {checkpoint.failed_doc_count}"
     )
+    metrics.update(bulk_sender.metrics)
+    indexing_metrics = get_indexing_metrics(
+        metrics, sent_doc_count, time.monotonic() - start
+    )
+    logging.info(f"Indexing metrics: {indexing_metrics}")
+
+    # The index is not refreshed while loaded, make the documents searchable
+    elastic_connection.indices.refresh(index=elastic_index)
 
-    # Indexing performance :
-    #
-    # The _/cat/count/{index} is called only once at the end of the indexing process
-    # and not after each pushed bulk
-    #
-    # i.e. the _cat/count/{index} produce a query that may force Lucene to refresh the
-    # last bulk into a segment
-    # meaning that it would amplify the amount of segment merge and slowdown the
-    # indexing process
+    # The documents are counted once, at the end of the indexing and not after each
+    # bulk: a count may force Lucene to refresh the last bulk into a segment, which
+    # would add segment merges and slow down the indexing
 
     # Add wait and retry mechanism for zero count
     max_retries = 5
@@ -151,4 +577,4 @@ def index_unites_legales_by_chunk(
         else:
             logging.error("Max retries reached. Document count is still zero.")
 
-    return doc_count
+    return doc_count, indexing_metrics
@@ -0,0 +1,95 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.warm_up import (
+    get_warm_up_search,
+)
+
+LOAD_TEST_PERCENTILES = [50, 95, 99]
+LOAD_TEST_REQUEST_TIMEOUT = 60  # seconds
+# The queries are shuffled with a fixed seed, so that two runs send the same mix
+# in the same order
+LOAD_TEST_SEED = 0
+
+
+def get_query_mix(query_weights, request_count):
+    """Return `request_count` search API queries (e.g. "q=rue&page=1"), each query
+    being sent in proportion to its weight."""
+    weighted_queries = [
+        query for query, weight in sorted(query_weights.items()) for _ in range(weight)
+    ]
+    queries = [
+        weighted_queries[i % len(weighted_queries)] for i in range(request_count)
+    ]
+    random.Random(LOAD_TEST_SEED).shuffle(queries)
+    return queries
+
+
+def get_percentile(sorted_latencies, percentile):
+    """Nearest-rank percentile of a sorted list of latencies."""
+    rank = max(1, -(-percentile * len(sorted_latencies) // 100))
+    return sorted_latencies[rank - 1]
+
+
+def get_elastic_search(elastic_connection, elastic_index):
+    """Search function sending the approximation of a search API query from
+    `get_warm_up_search` to `elastic_index`, which may be an alias."""
+
+    def search(api_query):
+        elastic_connection.search(
+            index=elastic_index,
+            body=get_warm_up_search(api_query),
+            request_timeout=LOAD_TEST_REQUEST_TIMEOUT,
+        )
+
+    return search
+
+
+def run_load_test(search, queries, thread_count):
+    """Run `search` on every query with `thread_count` concurrent threads, and
+    return the latency percentiles (milliseconds) and the throughput."""
+
+    def timed_search(api_query):
+        start = time.perf_counter()
+        search(api_query)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        latencies = sorted(executor.map(timed_search, queries))
+    duration = time.perf_counter() - start
+
+    report = {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / duration, 1),
+    }
+    for percentile in LOAD_TEST_PERCENTILES:
+        report[f"p{percentile}"] = round(get_percentile(latencies, percentile), 1)
+    return report
+
+
+def format_load_test_report(report):
+    return (
+        f"{report['requests']} requests, {report['requests_per_second']} requests/s, "
+        + ", ".join(
+            f"p{percentile} {report[f'p{percentile}']}ms"
+            for percentile in LOAD_TEST_PERCENTILES
+        )
+    )
+
+
+def get_latency_regressions(candidate_report, baseline_report, threshold, min_delta):
+    """Percentiles of the candidate which are more than `threshold` times, and more
+    than `min_delta` milliseconds, slower than the baseline."""
+    regressions = []
+    for percentile in LOAD_TEST_PERCENTILES:
+        key = f"p{percentile}"
+        if (
+            candidate_report[key] > baseline_report[key] * threshold
+            and candidate_report[key] - baseline_report[key] > min_delta
+        ):
+            regressions.append(
+                f"{key} {candidate_report[key]}ms against {baseline_report[key]}ms"
+            )
+    return regressions
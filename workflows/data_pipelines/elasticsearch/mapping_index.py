@@ -15,7 +15,12 @@ from elasticsearch_dsl import (
     token_filter,
     tokenizer,
 )
-from dag_datalake_sirene.config import ELASTIC_SHARDS, ELASTIC_REPLICAS
+from dag_datalake_sirene.config import (
+    ELASTIC_SHARDS,
+    ELASTIC_REPLICAS,
+    ELASTIC_INDEX_SORT,
+    ELASTIC_INDEX_CODEC,
+)
 
 # Define filters
 french_stop = token_filter("french_stop", type="stop", stopwords="_french_")
@@ -378,6 +383,35 @@ class UniteLegaleMapping(InnerDoc):
     tranche_effectif_salarie_unite_legale = Keyword()
 
 
+def get_index_settings(shards, sort, codec):
+    """
+    Settings of a new index
+    :param shards: number of primary shards
+    :type shards: int
+    :param sort: index sort, fields and their order ("asc" or "desc")
+    :type sort: dict
+    :param codec: stored fields compression, "default" or "best_compression"
+    :type codec: str
+
+    The documents of each segment are stored in the order of the index sort, so a
+    search sorted the same way (e.g. by `facteur_taille_entreprise`, biggest
+    companies first) stops once it has collected enough hits, instead of visiting
+    every matching document.
+    """
+    settings = {
+        "number_of_shards": shards,
+        "number_of_replicas": ELASTIC_REPLICAS,
+        "mapping": {"ignore_malformed": True},
+        "index.mapping.nested_objects.limit": 20000,
+        "index.codec": codec,
+    }
+    if sort:
+        settings["index.sort.field"] = list(sort)
+        settings["index.sort.order"] = list(sort.values())
+        settings["index.sort.missing"] = ["_last"] * len(sort)
+    return settings
+
+
 class StructureMapping(Document):
     identifiant = Keyword()
     nom_complet = Text(analyzer=annuaire_analyzer, fields={"keyword": Keyword()})
@@ -385,9 +419,24 @@ class StructureMapping(Document):
     unite_legale = Object(UniteLegaleMapping)
 
     class Index:
-        settings = {
-            "number_of_shards": ELASTIC_SHARDS,
-            "number_of_replicas": ELASTIC_REPLICAS,
-            "mapping": {"ignore_malformed": True},
-            "index.mapping.nested_objects.limit": 20000,
-        }
+        settings = get_index_settings(
+            ELASTIC_SHARDS, ELASTIC_INDEX_SORT, ELASTIC_INDEX_CODEC
+        )
+
+
+# Settings of an index while it is loaded, as nobody searches it yet
+# * no refresh, the documents are made searchable once at the end of the load
+# * the translog is fsynced in the background instead of after each bulk request,
+#   and flushed less often
+bulk_load_settings = {
+    "index.refresh_interval": -1,
+    "index.translog.durability": "async",
+    "index.translog.flush_threshold_size": "2gb",
+}
+# Read time settings, restored before the index is made live (None resets a setting
+# to its default value)
+read_settings = {
+    "index.refresh_interval": None,
+    "index.translog.durability": None,
+    "index.translog.flush_threshold_size": None,
+}
@@ -7,11 +7,8 @@ from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.data_enrichment
     format_dirigeants_pm,
     format_etablissements_and_complements,
     format_nom,
-    format_nom_complet,
     format_personnes_physiques,
-    format_slug,
     format_siege_unite_legale,
-    get_nom_commercial,
     is_association,
     is_entrepreneur_individuel,
     is_ess,
@@ -40,14 +37,6 @@ def process_unites_legales(chunk_unites_legales_sqlite):
             True if unite_legale["statut_diffusion_unite_legale"] != "O" else False
         )
 
-        # Nom complet
-        unite_legale_processed["nom_complet"] = format_nom_complet(
-            unite_legale["nom"],
-            unite_legale["nom_usage"],
-            unite_legale["nom_raison_sociale"],
-            unite_legale["prenom"],
-        )
-
         # Replace missing values with 0
         unite_legale_processed["nombre_etablissements_ouverts"] = (
             0
@@ -223,18 +212,6 @@ def process_unites_legales(chunk_unites_legales_sqlite):
             unite_legale["siege"], is_non_diffusible
         )
 
-        # Slug Nom Complet
-        unite_legale_processed["slug"] = format_slug(
-            unite_legale_processed["nom_complet"],
-            unite_legale["sigle"],
-            get_nom_commercial(unite_legale_processed),
-            unite_legale["denomination_usuelle_1_unite_legale"],
-            unite_legale["denomination_usuelle_2_unite_legale"],
-            unite_legale["denomination_usuelle_3_unite_legale"],
-            unite_legale["siren"],
-            unite_legale["statut_diffusion_unite_legale"],
-        )
-
         # Convention collective
         unite_legale_processed["liste_idcc_unite_legale"] = str_to_list(
             unite_legale_processed["liste_idcc_unite_legale"]
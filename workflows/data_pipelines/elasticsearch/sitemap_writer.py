@@ -0,0 +1,94 @@
+import glob
+import gzip
+import os
+
+SITEMAP_NAME = "sitemap"
+# Maximum number of URLs of a sitemap file
+SITEMAP_MAX_URLS = 50000
+SITEMAP_COMPRESS_LEVEL = 6
+
+
+def is_in_sitemap(unite_legale):
+    """Only the active and public unités légales, except entrepreneurs individuels,
+    are listed in the sitemap."""
+    return (
+        unite_legale["etat_administratif_unite_legale"] == "A"
+        and unite_legale["nature_juridique_unite_legale"] != "1000"
+        and unite_legale["statut_diffusion_unite_legale"] == "O"
+    )
+
+
+def format_sitemap_line(code_postal, activite_principale_unite_legale, slug):
+    return (
+        f"{code_postal if code_postal else ''},"
+        f"{activite_principale_unite_legale if activite_principale_unite_legale else ''}"
+        f",{slug}\n"
+    )
+
+
+class SitemapWriter:
+    """
+    Write the sitemap lines (code postal, activité principale, slug) in gzip
+    compressed shards of at most `SITEMAP_MAX_URLS` lines, named
+    `{name}-{shard number}.csv.gz`, and list the shards in `{name}-index.csv`.
+    All the lines are also written to `{name}.csv`, the single file read by the
+    consumers of the sitemap before it was sharded.
+
+    The previous sitemap files of `directory` are removed when the writer is
+    created, the index file is written when it is closed.
+    """
+
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.name = name
+        for path in glob.glob(os.path.join(directory, f"{name}-*")):
+            os.remove(path)
+        self.csv_file = open(self.get_csv_path(), "w")
+
+        self.shards = []
+        self.shard_file = None
+        self.shard_line_count = 0
+        self.line_count = 0
+
+    def write(self, lines):
+        self.csv_file.write("".join(lines))
+        while lines:
+            if self.shard_file is None or self.shard_line_count >= SITEMAP_MAX_URLS:
+                self.open_shard()
+            shard_lines = lines[: SITEMAP_MAX_URLS - self.shard_line_count]
+            self.shard_file.write("".join(shard_lines).encode())
+            self.shard_line_count += len(shard_lines)
+            self.line_count += len(shard_lines)
+            lines = lines[len(shard_lines) :]
+
+    def open_shard(self):
+        if self.shard_file is not None:
+            self.shard_file.close()
+        self.shards.append(f"{self.name}-{len(self.shards) + 1}.csv.gz")
+        self.shard_file = gzip.open(
+            os.path.join(self.directory, self.shards[-1]),
+            "wb",
+            compresslevel=SITEMAP_COMPRESS_LEVEL,
+        )
+        self.shard_line_count = 0
+
+    def close(self):
+        if self.shard_file is not None:
+            self.shard_file.close()
+            self.shard_file = None
+        self.csv_file.close()
+        with open(self.get_index_path(), "w") as index_file:
+            index_file.write("".join(f"{shard}\n" for shard in self.shards))
+        return self.shards
+
+    def get_csv_path(self):
+        return os.path.join(self.directory, f"{self.name}.csv")
+
+    def get_index_path(self):
+        return os.path.join(self.directory, f"{self.name}-index.csv")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,68 @@
+# Tables and columns tracking the last update of the indexed data. Their maximum
+# values are stored in the index after each run, and used by the next delta
+# indexing to find the sirens which changed since then
+update_date_columns = [
+    ("unite_legale", "date_mise_a_jour_insee"),
+    ("unite_legale", "date_mise_a_jour_rne"),
+    ("etablissement", "date_mise_a_jour_insee"),
+    ("etablissement", "date_mise_a_jour_rne"),
+    ("dirigeant_pp", "date_mise_a_jour"),
+    ("dirigeant_pm", "date_mise_a_jour"),
+    ("beneficiaire", "date_mise_a_jour"),
+]
+
+# Every siren of the daily flux tables is considered as changed
+flux_tables = ["flux_unite_legale", "flux_etablissement"]
+
+# Tables of additional data, rebuilt from their source at each run without any
+# update date. A fingerprint of their content is stored along with the update
+# dates, and a change of any of them requires a full indexing
+additional_data_tables = [
+    "agence_bio",
+    "bilan_financier",
+    "colter",
+    "convention_collective",
+    "egapro",
+    "elus",
+    "ess_france",
+    "finess",
+    "marche_inclusion",
+    "organisme_formation",
+    "rge",
+    "spectacle",
+    "uai",
+]
+
+
+def get_update_date_key(table, column):
+    return f"{table}.{column}"
+
+
+def get_fingerprint_key(table):
+    return f"{table}.fingerprint"
+
+
+def select_last_update_date_query(table, column):
+    return f"SELECT MAX({column}) FROM {table}"
+
+
+def select_table_content_query(table):
+    return f"SELECT * FROM {table} ORDER BY rowid"
+
+
+def select_changed_sirens_query(last_update_dates):
+    """Query and parameters of the sirens updated after `last_update_dates`, as
+    returned by `select_last_update_date_query` during the previous indexing."""
+    queries = [f"SELECT siren FROM {table}" for table in flux_tables]
+    params = []
+    for table, column in update_date_columns:
+        key = get_update_date_key(table, column)
+        last_update_date = last_update_dates.get(key)
+        if key not in last_update_dates:
+            queries.append(f"SELECT siren FROM {table}")
+        elif last_update_date is None:
+            queries.append(f"SELECT siren FROM {table} WHERE {column} IS NOT NULL")
+        else:
+            queries.append(f"SELECT siren FROM {table} WHERE {column} > ?")
+            params.append(last_update_date)
+    return "\nUNION\n".join(queries), params
@@ -1,6 +1,7 @@
 import requests
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from dag_datalake_sirene.config import (
     AIRFLOW_ELK_DAG_NAME,
@@ -10,6 +11,9 @@ from dag_datalake_sirene.config import (
     ELASTIC_DOWNSTREAM_ALIAS,
 )
 
+DOWNSTREAM_POLL_INTERVAL = 5  # seconds
+DOWNSTREAM_TIMEOUT = 7200  # seconds
+
 
 def wait_for_downstream_import(**kwargs):
     elastic_index = kwargs["ti"].xcom_pull(
@@ -19,7 +23,8 @@ def wait_for_downstream_import(**kwargs):
         include_prior_dates=True,
     )
 
-    wait_for_downstream_index_import(elastic_index)
+    statuses = wait_for_downstream_index_import(elastic_index, get_downstream_urls())
+    kwargs["ti"].xcom_push(key="downstream_import", value=statuses)
 
 
 def wait_for_downstream_rollback_import(**kwargs):
@@ -28,44 +33,149 @@ def wait_for_downstream_rollback_import(**kwargs):
         task_ids="rollback_elastic_index",
     )
 
-    wait_for_downstream_index_import(elastic_index)
+    statuses = wait_for_downstream_index_import(elastic_index, get_downstream_urls())
+    kwargs["ti"].xcom_push(key="downstream_import", value=statuses)
 
 
-def wait_for_downstream_index_import(elastic_index):
-    downstream_urls = ELASTIC_DOWNSTREAM_URLS.split(",")
+def get_downstream_urls():
+    return [url for url in ELASTIC_DOWNSTREAM_URLS.split(",") if url]
 
-    if len(downstream_urls) == 0:
-        return
 
-    logging.info(f"Waiting for {elastic_index} to be imported on {downstream_urls}")
+def get_downstream_session():
+    session = requests.Session()
+    session.auth = (ELASTIC_DOWNSTREAM_USER, ELASTIC_DOWNSTREAM_PASSWORD)
+    return session
 
-    pending = downstream_urls
-    completed = []
 
-    waited_for = 0
-    timeout = 7200
+def rollback_downstream_aliases(**kwargs):
+    """Roll the downstream aliases back to the rollback target, on the downstream
+    servers which still hold it. The others restore it from its snapshot."""
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index",
+        task_ids="rollback_elastic_index",
+    )
+    session = get_downstream_session()
+
+    for url in get_downstream_urls():
+        response = session.head(f"{ url }/{elastic_index}")
+        if response.status_code != 200:
+            logging.info(f"{elastic_index} is not retained on {url}, restoring it")
+            continue
+
+        response = session.get(f"{ url }/_alias/{ELASTIC_DOWNSTREAM_ALIAS}")
+        indices = list(response.json().keys()) if response.status_code == 200 else []
+        actions = [
+            {"remove": {"index": index, "alias": ELASTIC_DOWNSTREAM_ALIAS}}
+            for index in indices
+        ]
+        actions.append(
+            {"add": {"index": elastic_index, "alias": ELASTIC_DOWNSTREAM_ALIAS}}
+        )
+
+        response = session.post(f"{ url }/_aliases", json={"actions": actions})
+        response.raise_for_status()
+        logging.info(
+            f"{ELASTIC_DOWNSTREAM_ALIAS} rolled back to {elastic_index} on {url}"
+        )
+
+
+def get_recovery_progress(session, url, elastic_index):
+    """Bytes recovered and total bytes of the shards of `elastic_index` being
+    restored on `url`, None before the restore has started or when the progress
+    cannot be read."""
+    response = session.get(f"{ url }/{elastic_index}/_recovery")
+    if response.status_code != 200:
+        return None
+    shards = response.json().get(elastic_index, {}).get("shards", [])
+    if not shards:
+        return None
+    return (
+        sum(shard["index"]["size"]["recovered_in_bytes"] for shard in shards),
+        sum(shard["index"]["size"]["total_in_bytes"] for shard in shards),
+    )
+
 
-    while len(pending) > 0 and waited_for < timeout:
-        for url in pending:
-            response = requests.get(
-                f"{ url }/{ELASTIC_DOWNSTREAM_ALIAS}",
-                auth=(ELASTIC_DOWNSTREAM_USER, ELASTIC_DOWNSTREAM_PASSWORD),
+def get_eta(recovered_bytes, total_bytes, first_progress):
+    """Seconds left, at the average rate since the first progress was observed."""
+    first_recovered_bytes, first_time = first_progress
+    elapsed = time.monotonic() - first_time
+    if recovered_bytes <= first_recovered_bytes or elapsed <= 0:
+        return None
+    rate = (recovered_bytes - first_recovered_bytes) / elapsed
+    return round((total_bytes - recovered_bytes) / rate)
+
+
+def is_downstream_target_ready(session, url, elastic_index):
+    """Whether `elastic_index` is behind the alias of `url` and green."""
+    response = session.get(f"{ url }/{ELASTIC_DOWNSTREAM_ALIAS}")
+    if response.status_code != 200 or elastic_index not in response.json():
+        return False
+    response = session.get(f"{ url }/_cluster/health/{elastic_index}")
+    return response.status_code == 200 and response.json()["status"] == "green"
+
+
+def wait_for_downstream_target(url, elastic_index, deadline):
+    """Poll `url` until `elastic_index` is behind its alias and green, logging the
+    restore progress. Return the last progress of the target."""
+    session = get_downstream_session()
+    start = time.monotonic()
+    first_progress = None
+    status = {
+        "url": url,
+        "completed": False,
+        "recovered_bytes": 0,
+        "total_bytes": 0,
+        "eta": None,
+    }
+
+    while time.monotonic() < deadline:
+        # Any unexpected response (error status, error page, connection error...) is
+        # considered as "not ready yet" until the deadline
+        try:
+            if is_downstream_target_ready(session, url, elastic_index):
+                status["completed"] = True
+                status["duration"] = round(time.monotonic() - start)
+                logging.info(f"Index available on {url} after {status['duration']}s")
+                return status
+            progress = get_recovery_progress(session, url, elastic_index)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logging.warning(f"{url} is not ready yet: {e}")
+            progress = None
+
+        if progress is not None:
+            status["recovered_bytes"], status["total_bytes"] = progress
+            if first_progress is None:
+                first_progress = (status["recovered_bytes"], time.monotonic())
+            status["eta"] = get_eta(*progress, first_progress)
+            logging.info(
+                f"{url}: {status['recovered_bytes']}/{status['total_bytes']} bytes "
+                f"restored, ETA {status['eta']}s"
             )
 
-            if response.status_code == 404:
-                continue
+        time.sleep(DOWNSTREAM_POLL_INTERVAL)
+
+    status["duration"] = round(time.monotonic() - start)
+    return status
 
-            indices = list(response.json().keys())
 
-            if elastic_index in indices:
-                logging.info(f"Index available on {url}")
-                completed.append(url)
+def wait_for_downstream_index_import(elastic_index, downstream_urls):
+    """Wait for `elastic_index` on every downstream server, all polled concurrently,
+    and return the status of each of them."""
+    if len(downstream_urls) == 0:
+        return []
 
-        pending = [url for url in downstream_urls if url not in completed]
+    logging.info(f"Waiting for {elastic_index} to be imported on {downstream_urls}")
 
-        if len(pending) > 0:
-            time.sleep(5)
-            waited_for += 5
+    deadline = time.monotonic() + DOWNSTREAM_TIMEOUT
+    with ThreadPoolExecutor(max_workers=len(downstream_urls)) as executor:
+        statuses = list(
+            executor.map(
+                lambda url: wait_for_downstream_target(url, elastic_index, deadline),
+                downstream_urls,
+            )
+        )
 
+    pending = [status["url"] for status in statuses if not status["completed"]]
     if len(pending) > 0:
-        raise Exception("Downstream import is taking too long")
+        raise Exception(f"Downstream import is taking too long on {pending}")
+    return statuses
@@ -3,18 +3,46 @@ from datetime import datetime
 from elasticsearch_dsl import connections
 from elasticsearch import NotFoundError
 
+from dag_datalake_sirene.helpers.filesystem import (
+    Filesystem,
+    JsonSerializer,
+)
+from dag_datalake_sirene.helpers.minio_helpers import minio_client
+from dag_datalake_sirene.helpers.slow_requests import SLOW_REQUESTS
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.field_audit import (
+    audit_index_fields,
+)
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.create_index import (
     ElasticCreateIndex,
 )
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.mapping_index import (
+    bulk_load_settings,
+    read_settings,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sitemap_writer import (
+    SITEMAP_NAME,
+    SitemapWriter,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.warm_up import (
+    warm_up_index,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.load_test import (
+    format_load_test_report,
+    get_elastic_search,
+    get_latency_regressions,
+    get_query_mix,
+    run_load_test,
+)
 
 # fmt: off
-from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sqlite.\
-    fields_to_index import (
-    select_fields_to_index_query,
-)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.\
+    indexing_checkpoint import IndexingCheckpoint
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.\
     indexing_unite_legale import (
+    get_additional_data_fingerprints,
+    get_changed_additional_data,
+    get_changed_sirens,
+    get_last_update_dates,
     index_unites_legales_by_chunk,
 )
 # fmt: on
@@ -25,7 +53,32 @@ from dag_datalake_sirene.config import (
     ELASTIC_PASSWORD,
     ELASTIC_BULK_THREAD_COUNT,
     ELASTIC_BULK_SIZE,
+    ELASTIC_BULK_MAX_CHUNK_BYTES,
+    ELASTIC_INDEXING_WORKER_COUNT,
+    ELASTIC_INDEXING_MODE,
+    ELASTIC_INDEXING_CHECKPOINT_MINIO_PATH,
+    ELASTIC_FORCE_MERGE_MAX_SEGMENTS,
     ELASTIC_MAX_LIVE_VERSIONS,
+    ELASTIC_WARM_UP_QUERIES,
+    ELASTIC_WARM_UP_LATENCY_BUDGET,
+    ELASTIC_LOAD_TEST_QUERIES,
+    ELASTIC_LOAD_TEST_REQUEST_COUNT,
+    ELASTIC_LOAD_TEST_THREAD_COUNT,
+    ELASTIC_LATENCY_REGRESSION_THRESHOLD,
+    ELASTIC_LATENCY_REGRESSION_MIN_DELTA,
+)
+
+ELASTIC_READER_ALIAS = "siren-reader"
+# Indices which were made live by `update_elastic_alias`, as opposed to the
+# candidates which failed before being promoted
+ELASTIC_PROMOTED_ALIAS = "siren-promoted"
+# Indices which were rolled back from, and must not be rolled back to
+ELASTIC_ROLLED_BACK_ALIAS = "siren-rolled-back"
+
+checkpoint_filesystem = Filesystem(
+    minio_client,
+    f"{minio_client.get_root_dirpath()}/{ELASTIC_INDEXING_CHECKPOINT_MINIO_PATH}/",
+    JsonSerializer(),
 )
 
 
@@ -35,10 +88,93 @@ def get_next_index_name(**kwargs):
     kwargs["ti"].xcom_push(key="elastic_index", value=elastic_index)
 
 
+def get_live_elastic_index(elastic_connection):
+    try:
+        config = elastic_connection.indices.get_alias(name=ELASTIC_READER_ALIAS)
+    except NotFoundError:
+        return None
+    return next(iter(config), None) if config is not None else None
+
+
+def get_elastic_index_last_update_dates(elastic_connection, elastic_index):
+    """Last update dates of the data indexed in `elastic_index`, stored in the
+    `_meta` of its mapping by `fill_elastic_siren_index`."""
+    mapping = elastic_connection.indices.get_mapping(index=elastic_index)
+    return mapping[elastic_index]["mappings"].get("_meta", {}).get("last_update_dates")
+
+
+def clone_elastic_index(elastic_connection, source_index, target_index):
+    """Clone the live index, sharing its segments, so that it keeps serving requests
+    while the clone is updated.
+
+    @see: https://www.elastic.co/guide/en/elasticsearch/reference/7.17/indices-clone-index.html
+    """
+    # The source index must be read-only to be cloned
+    elastic_connection.indices.put_settings(
+        index=source_index, body={"index.blocks.write": True}
+    )
+    try:
+        elastic_connection.indices.clone(index=source_index, target=target_index)
+    finally:
+        elastic_connection.indices.put_settings(
+            index=source_index, body={"index.blocks.write": None}
+        )
+    # The clone is loaded with the same settings as a new index
+    elastic_connection.indices.put_settings(
+        index=target_index, body={"index.blocks.write": None, **bulk_load_settings}
+    )
+
+
 def create_elastic_index(**kwargs):
     elastic_index = kwargs["ti"].xcom_pull(
         key="elastic_index", task_ids="get_next_index_name"
     )
+
+    if ELASTIC_INDEXING_MODE == "delta":
+        connections.create_connection(
+            hosts=[ELASTIC_URL],
+            http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+            retry_on_timeout=True,
+        )
+        elastic_connection = connections.get_connection()
+
+        live_index = get_live_elastic_index(elastic_connection)
+        last_update_dates = (
+            get_elastic_index_last_update_dates(elastic_connection, live_index)
+            if live_index is not None
+            else None
+        )
+
+        changed_additional_data = (
+            get_changed_additional_data(
+                last_update_dates,
+                get_additional_data_fingerprints(AIRFLOW_ELK_DATA_DIR + "sirene.db"),
+            )
+            if last_update_dates
+            else []
+        )
+
+        if last_update_dates and not changed_additional_data:
+            logging.info(
+                f"******************** Index to clone: {live_index} "
+                f"into {elastic_index}"
+            )
+            clone_elastic_index(elastic_connection, live_index, elastic_index)
+            kwargs["ti"].xcom_push(key="last_update_dates", value=last_update_dates)
+            return
+
+        if changed_additional_data:
+            logging.warning(
+                f"Additional data changed since the live index: "
+                f"{', '.join(changed_additional_data)}, falling back to a full "
+                f"indexing"
+            )
+        else:
+            logging.warning(
+                "No last update dates found on the live index, "
+                "falling back to a full indexing"
+            )
+
     logging.info(f"******************** Index to create: {elastic_index}")
     create_index = ElasticCreateIndex(
         elastic_url=ELASTIC_URL,
@@ -48,15 +184,13 @@ def create_elastic_index(**kwargs):
         elastic_bulk_size=ELASTIC_BULK_SIZE,
     )
     create_index.execute()
+    kwargs["ti"].xcom_push(key="last_update_dates", value=None)
 
 
 def fill_elastic_siren_index(**kwargs):
     elastic_index = kwargs["ti"].xcom_pull(
         key="elastic_index", task_ids="get_next_index_name"
     )
-    sqlite_client = SqliteClient(AIRFLOW_ELK_DATA_DIR + "sirene.db")
-    sqlite_client.execute(select_fields_to_index_query)
-
     connections.create_connection(
         hosts=[ELASTIC_URL],
         http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
@@ -64,15 +198,61 @@ def fill_elastic_siren_index(**kwargs):
     )
     elastic_connection = connections.get_connection()
 
-    doc_count = index_unites_legales_by_chunk(
-        cursor=sqlite_client.db_cursor,
+    sqlite_db_location = AIRFLOW_ELK_DATA_DIR + "sirene.db"
+    last_update_dates = get_last_update_dates(sqlite_db_location)
+
+    # Delta mode : only the sirens changed since the indexing of the cloned index
+    sirens = None
+    previous_last_update_dates = kwargs["ti"].xcom_pull(
+        key="last_update_dates", task_ids="create_elastic_index"
+    )
+    if previous_last_update_dates:
+        sirens = get_changed_sirens(sqlite_db_location, previous_last_update_dates)
+        logging.info(f"******************** Sirens to update: {len(sirens)}")
+
+    # The progress is saved for this index only, a recreated index with the same
+    # name starts from scratch
+    creation_date = elastic_connection.indices.get_settings(
+        index=elastic_index, name="index.creation_date"
+    )[elastic_index]["settings"]["index"]["creation_date"]
+    checkpoint = IndexingCheckpoint(
+        checkpoint_filesystem, f"{elastic_index}-{creation_date}"
+    )
+
+    # The sitemap is written while indexing all the unités légales, see
+    # `create_sitemap`
+    sitemap_writer = (
+        SitemapWriter(AIRFLOW_ELK_DATA_DIR, SITEMAP_NAME) if sirens is None else None
+    )
+    doc_count, indexing_metrics = index_unites_legales_by_chunk(
+        sqlite_db_location=sqlite_db_location,
         elastic_connection=elastic_connection,
         elastic_bulk_thread_count=ELASTIC_BULK_THREAD_COUNT,
         elastic_bulk_size=ELASTIC_BULK_SIZE,
+        elastic_bulk_max_chunk_bytes=ELASTIC_BULK_MAX_CHUNK_BYTES,
+        elastic_worker_count=ELASTIC_INDEXING_WORKER_COUNT,
         elastic_index=elastic_index,
+        checkpoint=checkpoint,
+        sirens=sirens,
+        sitemap_writer=sitemap_writer,
+    )
+    checkpoint.delete()
+    # A resumed indexing only wrote the sitemap lines of the remaining unités légales
+    sitemap_created = sitemap_writer is not None and not checkpoint.resumed
+    if sitemap_writer is not None:
+        sitemap_writer.close()
+        logging.info(
+            f"******************** Sitemap lines written while indexing: "
+            f"{sitemap_writer.line_count}, complete: {sitemap_created}"
+        )
+    kwargs["ti"].xcom_push(key="sitemap_created", value=sitemap_created)
+
+    # Reference for the next delta indexing
+    elastic_connection.indices.put_mapping(
+        index=elastic_index, body={"_meta": {"last_update_dates": last_update_dates}}
     )
     kwargs["ti"].xcom_push(key="doc_count", value=doc_count)
-    sqlite_client.commit_and_close_conn()
+    kwargs["ti"].xcom_push(key="indexing_metrics", value=indexing_metrics)
 
 
 def check_elastic_index(**kwargs):
@@ -88,28 +268,278 @@ def check_elastic_index(**kwargs):
         )
 
 
-def delete_previous_elastic_indices(**kwargs):
+def force_merge_elastic_index(**kwargs):
+    """
+    Merge the segments of the loaded index, which is not written anymore: searches
+    go through fewer segments, and the snapshot of the index is smaller.
+    Documents deleted by a delta indexing are purged as well.
+
+    @see: https://www.elastic.co/guide/en/elasticsearch/reference/7.17/indices-forcemerge.html
+    """
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="get_next_index_name"
+    )
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+    elastic_connection = connections.get_connection()
+
+    logging.info(
+        f"******************** Merging {elastic_index} into "
+        f"{ELASTIC_FORCE_MERGE_MAX_SEGMENTS} segments per shard"
+    )
+    elastic_connection.indices.forcemerge(
+        index=elastic_index,
+        max_num_segments=ELASTIC_FORCE_MERGE_MAX_SEGMENTS,
+        request_timeout=6 * 60 * 60,
+    )
+
+
+def restore_elastic_index_settings(**kwargs):
+    """Restore the read time settings of the loaded index before it is made live."""
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="get_next_index_name"
+    )
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+    elastic_connection = connections.get_connection()
+
+    logging.info(f"******************** Restoring read settings of {elastic_index}")
+    elastic_connection.indices.put_settings(index=elastic_index, body=read_settings)
+
+
+def warm_up_elastic_index(**kwargs):
+    """Replay the slow requests, and the configured warm-up queries, against the new
+    index until they meet the latency budget, or for at most `WARM_UP_MAX_ROUNDS`
+    rounds."""
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="get_next_index_name"
+    )
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+    elastic_connection = connections.get_connection()
+
+    latencies = warm_up_index(
+        elastic_connection,
+        elastic_index,
+        sorted(SLOW_REQUESTS | set(ELASTIC_WARM_UP_QUERIES)),
+        ELASTIC_WARM_UP_LATENCY_BUDGET,
+    )
+    kwargs["ti"].xcom_push(key="warm_up_latencies", value=latencies)
+
+
+def check_search_latency(**kwargs):
+    """Load test the new index, then the index of the alias with the same queries,
+    and report whether the new index is slower beyond the configured threshold.
+
+    The queries only approximate the API queries (see `get_warm_up_search`), so a
+    regression is logged as a warning and does not block the update of the alias.
+    """
+    elastic_index = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="get_next_index_name"
+    )
     connections.create_connection(
         hosts=[ELASTIC_URL],
         http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
         retry_on_timeout=True,
     )
+    elastic_connection = connections.get_connection()
+
+    query_weights = ELASTIC_LOAD_TEST_QUERIES or {
+        query: 1 for query in SLOW_REQUESTS | set(ELASTIC_WARM_UP_QUERIES)
+    }
+    queries = get_query_mix(query_weights, ELASTIC_LOAD_TEST_REQUEST_COUNT)
+
+    reports = {}
+    indices = [elastic_index]
+    if elastic_connection.indices.exists_alias(name=ELASTIC_READER_ALIAS):
+        indices.append(ELASTIC_READER_ALIAS)
+    for index in indices:
+        reports[index] = run_load_test(
+            get_elastic_search(elastic_connection, index),
+            queries,
+            ELASTIC_LOAD_TEST_THREAD_COUNT,
+        )
+        logging.info(f"******* {index}: {format_load_test_report(reports[index])}")
+    kwargs["ti"].xcom_push(key="search_latency", value=reports)
+
+    if ELASTIC_READER_ALIAS not in reports:
+        logging.info(f"No {ELASTIC_READER_ALIAS} alias to compare {elastic_index} to")
+        return
+    regressions = get_latency_regressions(
+        reports[elastic_index],
+        reports[ELASTIC_READER_ALIAS],
+        ELASTIC_LATENCY_REGRESSION_THRESHOLD,
+        ELASTIC_LATENCY_REGRESSION_MIN_DELTA,
+    )
+    kwargs["ti"].xcom_push(key="search_latency_regressions", value=regressions)
+    if regressions:
+        logging.warning(
+            f"{elastic_index} is slower than {ELASTIC_READER_ALIAS}: "
+            f"{', '.join(regressions)}"
+        )
+
 
+def audit_elastic_index_fields(**kwargs):
+    """Report the storage and query usage of each field of the live index."""
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
     elastic_connection = connections.get_connection()
 
+    elastic_index = get_live_elastic_index(elastic_connection)
+    if elastic_index is None:
+        raise Exception(f"No index behind the {ELASTIC_READER_ALIAS} alias")
+    report = audit_index_fields(elastic_connection, elastic_index)
+    kwargs["ti"].xcom_push(key="field_audit", value=report)
+
+
+def get_alias_indices(elastic_connection, alias):
+    try:
+        config = elastic_connection.indices.get_alias(name=alias)
+    except NotFoundError:
+        return []
+    return list(config.keys()) if config is not None else []
+
+
+def get_siren_indices(elastic_connection):
+    """Date-versioned siren indices, oldest first."""
     indices = elastic_connection.cat.indices(index="siren-*", format="json")
-    indices = [
-        index
+    return sorted(
+        index["index"]
         for index in indices
         if index["index"] not in ["siren-green", "siren-blue"]
+    )
+
+
+def get_promoted_indices(elastic_connection, indices):
+    """The indices of `indices` which were made live, oldest first.
+
+    The indices older than the first one tagged with the "siren-promoted" alias
+    were created before the promotions were tagged, and are assumed to have been
+    live."""
+    promoted_indices = set(
+        get_alias_indices(elastic_connection, ELASTIC_PROMOTED_ALIAS)
+    )
+    live_index = get_live_elastic_index(elastic_connection)
+    if live_index is not None:
+        promoted_indices.add(live_index)
+    if not promoted_indices:
+        return []
+    first_promoted_index = min(promoted_indices)
+    return [
+        index
+        for index in indices
+        if index in promoted_indices or index < first_promoted_index
+    ]
+
+
+def get_rollback_target(elastic_connection):
+    """The index the live index would be rolled back to: the most recent promoted
+    index older than the live one, which has not been rolled back from itself."""
+    live_index = get_live_elastic_index(elastic_connection)
+    if live_index is None:
+        return None
+    rolled_back_indices = get_alias_indices(
+        elastic_connection, ELASTIC_ROLLED_BACK_ALIAS
+    )
+    candidates = [
+        index
+        for index in get_promoted_indices(
+            elastic_connection, get_siren_indices(elastic_connection)
+        )
+        if index < live_index and index not in rolled_back_indices
     ]
-    indices = list(sorted(indices, key=lambda index: index["index"]))
+    return candidates[-1] if candidates else None
+
+
+def delete_previous_elastic_indices(**kwargs):
+    """Keep the `ELASTIC_MAX_LIVE_VERSIONS` most recent promoted indices searchable,
+    so that a rollback only updates the alias. The live index and its rollback
+    target are always kept, indices rolled back from are not counted as versions.
+
+    The candidates which failed before being promoted are deleted, except the index
+    of the current run."""
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+
+    elastic_connection = connections.get_connection()
 
-    to_remove = indices[:-ELASTIC_MAX_LIVE_VERSIONS]
+    indices = get_siren_indices(elastic_connection)
+    promoted_indices = get_promoted_indices(elastic_connection, indices)
+    rolled_back_indices = get_alias_indices(
+        elastic_connection, ELASTIC_ROLLED_BACK_ALIAS
+    )
+    versions = [index for index in promoted_indices if index not in rolled_back_indices]
+    to_keep = set(versions[-ELASTIC_MAX_LIVE_VERSIONS:])
+    to_keep.add(get_live_elastic_index(elastic_connection))
+    to_keep.add(get_rollback_target(elastic_connection))
+    to_keep.add(
+        kwargs["ti"].xcom_pull(key="elastic_index", task_ids="get_next_index_name")
+    )
 
-    for index in to_remove:
-        logging.info(f'Removing index {index["index"]}')
-        elastic_connection.indices.delete(index=index["index"])
+    for index in indices:
+        if index in to_keep:
+            continue
+        if index in promoted_indices:
+            logging.info(f"Removing index {index}")
+        else:
+            logging.info(f"Removing index {index}, which was never promoted")
+        elastic_connection.indices.delete(index=index)
+
+
+def rollback_elastic_index(**kwargs):
+    """
+    Roll the live index back to the previous retained index, as checked by
+    `check_rollback_target`, with an atomic update of the "siren-reader" alias. The
+    index rolled back from is added to the "siren-rolled-back" alias, so that it is
+    never chosen as a rollback target again.
+    """
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+
+    elastic_connection = connections.get_connection()
+
+    live_index = get_live_elastic_index(elastic_connection)
+    rollback_target = get_rollback_target(elastic_connection)
+    checked_rollback_target = kwargs["ti"].xcom_pull(
+        key="elastic_index", task_ids="check_rollback_target"
+    )
+    if rollback_target is None or rollback_target != checked_rollback_target:
+        raise Exception(
+            f"The rollback target of {live_index} changed since it was checked: "
+            f"{rollback_target} instead of {checked_rollback_target}"
+        )
+
+    logging.info(
+        f"Rolling back {ELASTIC_READER_ALIAS} from {live_index} to {rollback_target}"
+    )
+    elastic_connection.indices.update_aliases(
+        {
+            "actions": [
+                {"remove": {"index": live_index, "alias": ELASTIC_READER_ALIAS}},
+                {"add": {"index": rollback_target, "alias": ELASTIC_READER_ALIAS}},
+                {"add": {"index": live_index, "alias": ELASTIC_ROLLED_BACK_ALIAS}},
+            ]
+        }
+    )
+    kwargs["ti"].xcom_push(key="elastic_index", value=rollback_target)
 
 
 def update_elastic_alias(**kwargs):
@@ -136,7 +566,7 @@ def update_elastic_alias(**kwargs):
 
     elastic_connection = connections.get_connection()
 
-    alias = "siren-reader"
+    alias = ELASTIC_READER_ALIAS
     elastic_index = kwargs["ti"].xcom_pull(
         key="elastic_index", task_ids="get_next_index_name"
     )
@@ -160,6 +590,12 @@ def update_elastic_alias(**kwargs):
     ]
 
     actions.append({"add": {"index": elastic_index, "alias": alias}})
+    # Tag the promoted indices, the previous live index included in case it was
+    # made live before the promotions were tagged
+    actions.extend(
+        {"add": {"index": index, "alias": ELASTIC_PROMOTED_ALIAS}}
+        for index in [*indices, elastic_index]
+    )
 
     logging.info(
         f"Updating alias siren-reader : add {elastic_index}, remove {', '.join(indices)}"
@@ -5,10 +5,30 @@ def send_notification_success_tchap(**kwargs):
     doc_count = kwargs["ti"].xcom_pull(
         key="doc_count", task_ids="fill_elastic_siren_index"
     )
+    indexing_metrics = kwargs["ti"].xcom_pull(
+        key="indexing_metrics", task_ids="fill_elastic_siren_index"
+    )
     send_message(
         f"\U0001F7E2 Données :"
         f"\nDAG d'indexation a été exécuté avec succès."
         f"\n - Nombre de documents indexés : {doc_count}"
+        f"{format_indexing_metrics(indexing_metrics) if indexing_metrics else ''}"
+    )
+
+
+def format_indexing_metrics(indexing_metrics):
+    mega_byte = 1024 * 1024
+    return (
+        f"\n - Durée d'indexation : {indexing_metrics['duration']}s "
+        f"({indexing_metrics['documents_per_second']} documents/s, "
+        f"{indexing_metrics['bytes_per_second'] / mega_byte:.1f} Mo/s)"
+        f"\n - Temps cumulés : SQLite {indexing_metrics['sqlite_fetch_time']}s, "
+        f"traitement {indexing_metrics['process_time']}s, "
+        f"sérialisation {indexing_metrics['serialization_time']}s, "
+        f"bulk {indexing_metrics['bulk_time']}s "
+        f"({indexing_metrics['bulk_requests']} requêtes)"
+        f"\n - Pic mémoire : {indexing_metrics['peak_rss'] // mega_byte} Mo "
+        f"(workers : {indexing_metrics['workers_peak_rss'] // mega_byte} Mo)"
     )
 
 
@@ -1,88 +1,110 @@
+import logging
 import os
 
-
-from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.data_enrichment import (
-    format_nom_complet,
-    format_slug,
-)
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_READ_MODE,
+    SqliteClient,
+)
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sitemap_writer import (
+    SITEMAP_NAME,
+    SitemapWriter,
+    format_sitemap_line,
+    is_in_sitemap,
+)
 from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.sqlite.sitemap import (
     select_sitemap_fields_query,
 )
 from dag_datalake_sirene.config import (
     AIRFLOW_ELK_DATA_DIR,
-    AIRFLOW_ENV,
 )
 
+SITEMAP_FETCH_SIZE = 10000
+
 
-def create_sitemap():
-    sqlite_client = SqliteClient(AIRFLOW_ELK_DATA_DIR + "sirene.db")
-    sqlite_client.execute(select_sitemap_fields_query)
+def get_sitemap_line(ul):
+    return format_sitemap_line(
+        ul["code_postal"], ul["activite_principale_unite_legale"], ul["slug"]
+    )
 
-    if os.path.exists(AIRFLOW_ELK_DATA_DIR + "sitemap-" + AIRFLOW_ENV + ".csv"):
-        os.remove(AIRFLOW_ELK_DATA_DIR + "sitemap-" + AIRFLOW_ENV + ".csv")
 
-    chunk_unites_legales_sqlite = 1
-    while chunk_unites_legales_sqlite:
-        chunk_unites_legales_sqlite = sqlite_client.db_cursor.fetchmany(1500)
+def create_sitemap(**kwargs):
+    # The sitemap is usually written while indexing all the unités légales, it is
+    # only created from the database after a delta or a resumed indexing
+    if kwargs["ti"].xcom_pull(
+        key="sitemap_created", task_ids="fill_elastic_siren_index"
+    ):
+        logging.info("******************** Sitemap already created while indexing")
+        return
 
-        unite_legale_columns = tuple(
-            [x[0] for x in sqlite_client.db_cursor.description]
-        )
-        liste_unites_legales_sqlite = []
-        # Group all fetched unites_legales from sqlite in one list
-        for unite_legale in chunk_unites_legales_sqlite:
-            liste_unites_legales_sqlite.append(
-                {
-                    unite_legale_columns: value
-                    for unite_legale_columns, value in zip(
-                        unite_legale_columns, unite_legale
+    sqlite_client = SqliteClient(
+        AIRFLOW_ELK_DATA_DIR + "sirene.db", mode=SQLITE_READ_MODE
+    )
+    cursor = sqlite_client.execute(select_sitemap_fields_query)
+    unite_legale_columns = tuple([x[0] for x in cursor.description])
+
+    with SitemapWriter(AIRFLOW_ELK_DATA_DIR, SITEMAP_NAME) as sitemap_writer:
+        while chunk_unites_legales_sqlite := cursor.fetchmany(SITEMAP_FETCH_SIZE):
+            sitemap_writer.write(
+                [
+                    get_sitemap_line(ul)
+                    for ul in (
+                        dict(zip(unite_legale_columns, unite_legale))
+                        for unite_legale in chunk_unites_legales_sqlite
                     )
-                }
+                    if is_in_sitemap(ul)
+                ]
             )
-        slugs = ""
-        for ul in liste_unites_legales_sqlite:
-            if (
-                ul["etat_administratif_unite_legale"] == "A"
-                and ul["nature_juridique_unite_legale"] != "1000"
-                and ul["statut_diffusion_unite_legale"] == "O"
-            ):
-                if not ul["code_postal"]:
-                    ul["code_postal"] = ""
-                if not ul["activite_principale_unite_legale"]:
-                    ul["activite_principale_unite_legale"] = ""
-                nom_complet = format_nom_complet(
-                    nom_raison_sociale=ul["nom_raison_sociale"],
-                )
-                slug = format_slug(
-                    nom_complet,
-                    ul["sigle"],
-                    ul["nom_commercial"],
-                    ul["denomination_usuelle_1_unite_legale"],
-                    ul["denomination_usuelle_2_unite_legale"],
-                    ul["denomination_usuelle_3_unite_legale"],
-                    ul["siren"],
-                    ul["statut_diffusion_unite_legale"],
-                )
-                slugs = (
-                    f"{slugs}{ul['code_postal']},"
-                    f"{ul['activite_principale_unite_legale']},{slug}\n"
-                )
-
-        with open(AIRFLOW_ELK_DATA_DIR + "sitemap-" + AIRFLOW_ENV + ".csv", "a+") as f:
-            f.write(slugs)
+    sqlite_client.commit_and_close_conn()
+    logging.info(
+        f"******************** Sitemap lines: {sitemap_writer.line_count}, "
+        f"in {len(sitemap_writer.shards)} files"
+    )
 
 
 def update_sitemap():
+    sitemap_index = f"{SITEMAP_NAME}-index.csv"
+    with open(os.path.join(AIRFLOW_ELK_DATA_DIR, sitemap_index)) as f:
+        shards = f.read().splitlines()
+    # The index is sent last, once all the files it lists are available
     minio_client.send_files(
         list_files=[
             {
                 "source_path": AIRFLOW_ELK_DATA_DIR,
-                "source_name": f"sitemap-{AIRFLOW_ENV}.csv",
+                "source_name": shard,
                 "dest_path": "",
-                "dest_name": "sitemap.csv",
-                "content_type": "text/csv",
+                "dest_name": shard,
+                "content_type": "application/gzip",
             }
+            for shard in shards
+        ]
+        + [
+            {
+                "source_path": AIRFLOW_ELK_DATA_DIR,
+                "source_name": f"{SITEMAP_NAME}.csv",
+                "dest_path": "",
+                "dest_name": f"{SITEMAP_NAME}.csv",
+                "content_type": "text/csv",
+            },
+            {
+                "source_path": AIRFLOW_ELK_DATA_DIR,
+                "source_name": sitemap_index,
+                "dest_path": "",
+                "dest_name": sitemap_index,
+                "content_type": "text/csv",
+            },
         ],
     )
+    # Shards of a previous, larger sitemap are no longer listed by the index
+    for stale_shard in get_stale_sitemap_shards(
+        minio_client.get_files_from_prefix(f"{SITEMAP_NAME}-"), shards
+    ):
+        minio_client.delete_file(f"{minio_client.get_root_dirpath()}/{stale_shard}")
+
+
+def get_stale_sitemap_shards(sitemap_files, shards):
+    return [
+        sitemap_file
+        for sitemap_file in sitemap_files
+        if sitemap_file.endswith(".csv.gz") and sitemap_file not in shards
+    ]
@@ -18,6 +18,9 @@ from dag_datalake_sirene.helpers.filesystem import (
     Filesystem,
     JsonSerializer,
 )
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.index import (
+    get_rollback_target,
+)
 
 filesystem = Filesystem(
     minio_client,
@@ -78,34 +81,65 @@ def update_minio_current_index_version(**kwargs):
     filesystem.write("current.json", content)
 
 
-def rollback_minio_current_index_version(**kwargs):
+def get_previous_version():
+    """The current.json file, and the state it references as previous."""
     content = filesystem.read("current.json")
 
-    if content is None:
+    if content is None or "previous" not in content:
         raise Exception("No previous version found")
 
-    previous = filesystem.read(content["current"]["file"])
+    previous = filesystem.read(content["previous"]["file"])
 
     if previous is None:
         raise Exception("No previous version found")
 
+    return content, previous
+
+
+def check_rollback_target(**kwargs):
+    """Check, before anything is rolled back, that the previous version on MinIO is
+    the index the live index would be rolled back to, and that its snapshot still
+    exists for the downstream servers to restore it."""
+    connections.create_connection(
+        hosts=[ELASTIC_URL],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+        retry_on_timeout=True,
+    )
+
     elastic_connection = connections.get_connection()
 
+    rollback_target = get_rollback_target(elastic_connection)
+    if rollback_target is None:
+        raise Exception("No retained index to roll the live index back to")
+
+    _, previous = get_previous_version()
+    if previous["current"]["index"] != rollback_target:
+        raise Exception(
+            f"The previous version {previous['current']['index']} is not the "
+            f"rollback target {rollback_target}"
+        )
+
     snapshots = elastic_connection.snapshot.get(
         repository=ELASTIC_SNAPSHOT_REPOSITORY,
         snapshot=previous["current"]["snapshot"],
         ignore_unavailable=True,
     )
 
-    if len(snapshots) == 0:
+    if len(snapshots["snapshots"]) == 0:
         raise Exception(
             f"The snapshot {previous['current']['snapshot']} no longer exists on Elasticsearch"
         )
 
-    logging.info(f"Rolling back to {content['current']['file']}")
-    filesystem.write("current.json", previous)
+    kwargs["ti"].xcom_push(key="elastic_index", value=rollback_target)
+
 
-    kwargs["ti"].xcom_push(key="elastic_index", value=previous["current"]["index"])
+def rollback_minio_current_index_version(**kwargs):
+    """Point current.json back to the previous state, so that the downstream servers
+    which no longer hold the rollback target restore it from its snapshot."""
+    content, previous = get_previous_version()
+
+    logging.info(f"Rolling back to {content['previous']['file']}")
+    filesystem.write("current.json", previous)
 
 
 def snapshot_elastic_index(**kwargs):
@@ -0,0 +1,107 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+# Number of warm-up searches run concurrently
+WARM_UP_THREAD_COUNT = 8
+# The searches are replayed until they all meet the latency budget, or fail the
+# warm-up after this number of rounds
+WARM_UP_MAX_ROUNDS = 5
+WARM_UP_REQUEST_TIMEOUT = 60  # seconds
+
+
+def get_warm_up_search(api_query):
+    """
+    Approximation of the Elasticsearch search run by the search API for
+    `api_query` (e.g. "per_page=10&page=1&q=rue&limite_matching_etablissements=3"):
+    full text search on `nom_complet` and on the addresses of the établissements,
+    sorted by score and company size.
+
+    The search API builds its own queries, which this one has not been checked
+    against, and the filters of `api_query` are ignored: the latencies of this
+    stand-in are only reported, they never block the update of the alias.
+    """
+    params = parse_qs(api_query)
+    terms = params.get("q", [""])[0]
+    per_page = int(params.get("per_page", [10])[0])
+    page = int(params.get("page", [1])[0])
+    limite_matching_etablissements = int(
+        params.get("limite_matching_etablissements", [10])[0]
+    )
+    return {
+        "query": {
+            "bool": {
+                "should": [
+                    {"match": {"nom_complet": {"query": terms, "operator": "and"}}},
+                    {
+                        "nested": {
+                            "path": "unite_legale.etablissements",
+                            "query": {
+                                "match": {
+                                    "unite_legale.etablissements.adresse": {
+                                        "query": terms,
+                                        "operator": "and",
+                                    }
+                                }
+                            },
+                            "inner_hits": {"size": limite_matching_etablissements},
+                        }
+                    },
+                ]
+            }
+        },
+        "sort": [
+            {"_score": "desc"},
+            {"unite_legale.facteur_taille_entreprise": "desc"},
+        ],
+        "from": (page - 1) * per_page,
+        "size": per_page,
+        "track_total_hits": True,
+    }
+
+
+def run_warm_up_searches(elastic_connection, elastic_index, api_queries):
+    """Run the searches of `api_queries` concurrently, and return the time spent by
+    Elasticsearch on each of them, in milliseconds."""
+
+    def search(api_query):
+        response = elastic_connection.search(
+            index=elastic_index,
+            body=get_warm_up_search(api_query),
+            request_timeout=WARM_UP_REQUEST_TIMEOUT,
+        )
+        return api_query, response["took"]
+
+    with ThreadPoolExecutor(max_workers=WARM_UP_THREAD_COUNT) as executor:
+        return dict(executor.map(search, api_queries))
+
+
+def warm_up_index(elastic_connection, elastic_index, api_queries, latency_budget):
+    """
+    Replay `api_queries` against `elastic_index` until every search takes less
+    than `latency_budget` milliseconds, so that the first production queries do
+    not pay for loading a cold index.
+
+    Return the latency of each search during the last round. As the searches only
+    approximate the API queries (see `get_warm_up_search`), a budget still not met
+    after `WARM_UP_MAX_ROUNDS` rounds is logged as a warning, and does not fail the
+    warm-up.
+    """
+    for warm_up_round in range(1, WARM_UP_MAX_ROUNDS + 1):
+        latencies = run_warm_up_searches(elastic_connection, elastic_index, api_queries)
+        for api_query, latency in sorted(latencies.items(), key=lambda x: -x[1]):
+            logging.info(f"Warm-up round {warm_up_round}: {latency}ms for {api_query}")
+
+        slow_queries = [
+            api_query
+            for api_query, latency in latencies.items()
+            if latency > latency_budget
+        ]
+        if not slow_queries:
+            return latencies
+
+    logging.warning(
+        f"{elastic_index} is still above the {latency_budget}ms latency budget after "
+        f"{WARM_UP_MAX_ROUNDS} warm-up rounds for: {', '.join(slow_queries)}"
+    )
+    return latencies
@@ -51,6 +51,10 @@ from dag_datalake_sirene.workflows.data_pipelines.etl.task_functions.\
 )
 
 
+from dag_datalake_sirene.workflows.data_pipelines.etl.task_functions.\
+    create_index_feed_tables import (
+    create_unite_legale_index_feed_table,
+)
 from dag_datalake_sirene.workflows.data_pipelines.etl.task_functions.\
     create_sqlite_database import (
     create_sqlite_database,
@@ -65,6 +69,7 @@ from dag_datalake_sirene.workflows.data_pipelines.etl.task_functions.\
     replace_unite_legale_table,
     add_rne_data_to_unite_legale_table,
     add_ancien_siege_flux_data,
+    add_nom_complet_and_slug_to_unite_legale_table,
 )
 from dag_datalake_sirene.workflows.data_pipelines.etl.task_functions.send_notification\
     import (
@@ -220,6 +225,12 @@ with DAG(
         python_callable=add_rne_data_to_siege_table,
     )
 
+    add_nom_complet_and_slug_to_unite_legale_table = PythonOperator(
+        task_id="add_nom_complet_and_slug_to_unite_legale_table",
+        provide_context=True,
+        python_callable=add_nom_complet_and_slug_to_unite_legale_table,
+    )
+
     create_historique_etablissement_table = PythonOperator(
         task_id="create_historique_etablissement_table",
         provide_context=True,
@@ -347,6 +358,12 @@ with DAG(
         python_callable=create_marche_inclusion_table,
     )
 
+    create_unite_legale_index_feed_table = PythonOperator(
+        task_id="create_unite_legale_index_feed_table",
+        provide_context=True,
+        python_callable=create_unite_legale_index_feed_table,
+    )
+
     send_database_to_minio = PythonOperator(
         task_id="upload_db_to_minio",
         provide_context=True,
@@ -405,7 +422,8 @@ with DAG(
     get_latest_rne_database.set_upstream(insert_date_fermeture_etablissement)
     inject_rne_unite_legale_data.set_upstream(get_latest_rne_database)
     inject_rne_siege_data.set_upstream(inject_rne_unite_legale_data)
-    create_dirig_pp_table.set_upstream(inject_rne_siege_data)
+    add_nom_complet_and_slug_to_unite_legale_table.set_upstream(inject_rne_siege_data)
+    create_dirig_pp_table.set_upstream(add_nom_complet_and_slug_to_unite_legale_table)
     create_dirig_pm_table.set_upstream(create_dirig_pp_table)
     create_benef_table.set_upstream(create_dirig_pm_table)
     create_immatriculation_table.set_upstream(create_benef_table)
@@ -424,7 +442,9 @@ with DAG(
     create_elu_table.set_upstream(create_colter_table)
     create_marche_inclusion_table.set_upstream(create_elu_table)
 
-    send_database_to_minio.set_upstream(create_marche_inclusion_table)
+    create_unite_legale_index_feed_table.set_upstream(create_marche_inclusion_table)
+
+    send_database_to_minio.set_upstream(create_unite_legale_index_feed_table)
     create_data_source_last_modified_file.set_upstream(send_database_to_minio)
     clean_folder.set_upstream(create_data_source_last_modified_file)
 
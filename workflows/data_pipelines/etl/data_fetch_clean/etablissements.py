@@ -1,24 +1,46 @@
 import logging
+import os
 import pandas as pd
-import requests
+import queue
 import minio
-import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from airflow.exceptions import AirflowSkipException
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
+from dag_datalake_sirene.helpers.utils import download_file
 from dag_datalake_sirene.config import (
+    ETABLISSEMENT_STOCK_CHUNK_SIZE,
+    ETABLISSEMENT_STOCK_THREAD_COUNT,
     URL_ETABLISSEMENTS,
     URL_MINIO_ETABLISSEMENTS_HISTORIQUE,
 )
 
+# Parsed chunks waiting to be inserted, per departement being downloaded. At most
+# ETABLISSEMENT_STOCK_THREAD_COUNT * (ETABLISSEMENT_STOCK_PREFETCH_CHUNKS + 1)
+# chunks are held in memory, whatever the size of the departement files
+ETABLISSEMENT_STOCK_PREFETCH_CHUNKS = 2
+# Seconds between two checks that the chunks are still expected
+ETABLISSEMENT_STOCK_PUT_TIMEOUT = 1
 
-def download_stock(departement):
+
+def get_stock_file_path(departement, data_dir):
+    return f"{data_dir}geo_siret_{departement}.csv.gz"
+
+
+def download_stock(departement, data_dir):
+    """Download a departement file into `data_dir`, and return an iterator over its
+    rows, by chunks of `ETABLISSEMENT_STOCK_CHUNK_SIZE` rows."""
     url = f"{URL_ETABLISSEMENTS}_{departement}.csv.gz"
     logging.info(f"Dep file url: {url}")
+    # The file is downloaded at once rather than read from the connection, which
+    # would stay idle while its chunks wait to be inserted
+    download_file(url, get_stock_file_path(departement, data_dir))
     df_dep = pd.read_csv(
-        url,
+        get_stock_file_path(departement, data_dir),
         compression="gzip",
         dtype=str,
+        chunksize=ETABLISSEMENT_STOCK_CHUNK_SIZE,
         usecols=[
             "siren",
             "siret",
@@ -158,24 +180,31 @@ def download_flux(data_dir):
 
 
 def download_historique(data_dir):
-    r = requests.get(URL_MINIO_ETABLISSEMENTS_HISTORIQUE, allow_redirects=True)
-    open(data_dir + "StockEtablissementHistorique_utf8.zip", "wb").write(r.content)
-    shutil.unpack_archive(data_dir + "StockEtablissementHistorique_utf8.zip", data_dir)
+    # The zip file is streamed to disk, then its CSV file is read by chunks from the
+    # archive, without being extracted
+    download_file(
+        URL_MINIO_ETABLISSEMENTS_HISTORIQUE,
+        data_dir + "StockEtablissementHistorique_utf8.zip",
+    )
     df_iterator = pd.read_csv(
-        f"{data_dir}StockEtablissementHistorique_utf8.csv",
+        f"{data_dir}StockEtablissementHistorique_utf8.zip",
         chunksize=100000,
         dtype=str,
+        compression="zip",
     )
     return df_iterator
 
 
 def preprocess_etablissement_data(siret_file_type, departement=None, data_dir=None):
+    """DataFrame of the flux file, or iterator over the chunks of a departement
+    file of the stock."""
     if siret_file_type == "stock":
-        df_etablissement = download_stock(departement)
+        return map(format_etablissement_data, download_stock(departement, data_dir))
     if siret_file_type == "flux":
-        df_etablissement = download_flux(data_dir)
+        return format_etablissement_data(download_flux(data_dir))
 
-    # Insert rows in database
+
+def format_etablissement_data(df_etablissement):
     df_etablissement["etablissementSiege"] = df_etablissement[
         "etablissementSiege"
     ].apply(lambda x: x.lower())
@@ -231,6 +260,66 @@ def preprocess_etablissement_data(siret_file_type, departement=None, data_dir=No
     return df_etablissement
 
 
+def download_stock_chunks(departement, data_dir, chunk_queue, stop_event):
+    """Put the preprocessed chunks of a departement file in `chunk_queue`, then None
+    or the error which stopped the download, unless `stop_event` is set. The
+    downloaded file is deleted afterwards."""
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                chunk_queue.put(item, timeout=ETABLISSEMENT_STOCK_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for df_chunk in preprocess_etablissement_data("stock", departement, data_dir):
+            if not put(df_chunk):
+                return
+    except Exception as error:
+        put(error)
+        return
+    finally:
+        if os.path.exists(get_stock_file_path(departement, data_dir)):
+            os.remove(get_stock_file_path(departement, data_dir))
+    put(None)
+
+
+def preprocess_stock_etablissement_data(departements, data_dir):
+    """
+    Iterator over the preprocessed chunks of the stock, departement after
+    departement.
+
+    The next departement files are downloaded into `data_dir` and parsed by a pool
+    of threads while the chunks of the current one are inserted, so that network
+    time and insertion time overlap.
+    """
+    stop_event = threading.Event()
+    chunk_queues = [
+        queue.Queue(maxsize=ETABLISSEMENT_STOCK_PREFETCH_CHUNKS) for _ in departements
+    ]
+    executor = ThreadPoolExecutor(max_workers=ETABLISSEMENT_STOCK_THREAD_COUNT)
+    try:
+        # The pool starts the departements in order, so the departement being read
+        # is always being downloaded or done
+        for departement, chunk_queue in zip(departements, chunk_queues):
+            executor.submit(
+                download_stock_chunks, departement, data_dir, chunk_queue, stop_event
+            )
+        for departement, chunk_queue in zip(departements, chunk_queues):
+            while (df_chunk := chunk_queue.get()) is not None:
+                if isinstance(df_chunk, Exception):
+                    raise Exception(
+                        f"Download of departement {departement} failed: {df_chunk}"
+                    ) from df_chunk
+                yield df_chunk
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def preprocess_historique_etablissement_data(data_dir):
     df_iterator = download_historique(data_dir)
 
@@ -1,36 +1,40 @@
 from datetime import datetime
 import ast
-import shutil
 import logging
 import minio
 import pandas as pd
-import requests
 from airflow.exceptions import AirflowSkipException
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
+from dag_datalake_sirene.helpers.utils import download_file
 from dag_datalake_sirene.config import (
     URL_MINIO_UNITE_LEGALE,
     URL_MINIO_UNITE_LEGALE_HISTORIQUE,
 )
 
 
+# The zip files are streamed to disk, then their CSV file is read by chunks from
+# the archive, without being extracted
 def download_historique(data_dir):
-    r = requests.get(URL_MINIO_UNITE_LEGALE_HISTORIQUE, allow_redirects=True)
-    open(data_dir + "StockUniteLegaleHistorique_utf8.zip", "wb").write(r.content)
-    shutil.unpack_archive(data_dir + "StockUniteLegaleHistorique_utf8.zip", data_dir)
+    download_file(
+        URL_MINIO_UNITE_LEGALE_HISTORIQUE,
+        data_dir + "StockUniteLegaleHistorique_utf8.zip",
+    )
     df_iterator = pd.read_csv(
-        f"{data_dir}StockUniteLegaleHistorique_utf8.csv",
+        f"{data_dir}StockUniteLegaleHistorique_utf8.zip",
         chunksize=100000,
         dtype=str,
+        compression="zip",
     )
     return df_iterator
 
 
 def download_stock(data_dir):
-    r = requests.get(URL_MINIO_UNITE_LEGALE, allow_redirects=True)
-    open(data_dir + "StockUniteLegale_utf8.zip", "wb").write(r.content)
-    shutil.unpack_archive(data_dir + "StockUniteLegale_utf8.zip", data_dir)
+    download_file(URL_MINIO_UNITE_LEGALE, data_dir + "StockUniteLegale_utf8.zip")
     df_iterator = pd.read_csv(
-        f"{data_dir}StockUniteLegale_utf8.csv", chunksize=100000, dtype=str
+        f"{data_dir}StockUniteLegale_utf8.zip",
+        chunksize=100000,
+        dtype=str,
+        compression="zip",
     )
     return df_iterator
 
@@ -1,7 +1,11 @@
 import logging
+import time
 
 
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
 
 
 from dag_datalake_sirene.config import (
@@ -32,6 +36,65 @@ def get_table_count(name):
     return f"""SELECT COUNT() FROM {name};"""
 
 
+def get_insert_query(table_name, columns):
+    column_names = ", ".join(f'"{column}"' for column in columns)
+    placeholders = ", ".join("?" for _ in columns)
+    return f"""INSERT INTO {table_name} ({column_names})
+        VALUES ({placeholders});"""
+
+
+def get_dataframe_rows(df):
+    """Rows of `df` as tuples of values sqlite can bind, with None for missing
+    values."""
+    df = df.astype(object).where(df.notna(), None)
+    return df.itertuples(index=False, name=None)
+
+
+def insert_dataframe(sqlite_client, table_name, df):
+    """Insert the rows of `df` into the columns of `table_name` with the same names,
+    in one transaction."""
+    with sqlite_client.db_conn:
+        sqlite_client.executemany(
+            get_insert_query(table_name, list(df.columns)), get_dataframe_rows(df)
+        )
+    return len(df)
+
+
+def load_table(sqlite_client, table_name, df_chunks):
+    """
+    Insert every DataFrame of `df_chunks` into `table_name` and return the number of
+    rows inserted.
+
+    The rows are inserted by a single prepared statement per chunk rather than by
+    `DataFrame.to_sql`, and the table is not counted after each chunk.
+    """
+    row_count = 0
+    insert_duration = 0
+    for df_chunk in df_chunks:
+        start = time.monotonic()
+        chunk_row_count = insert_dataframe(sqlite_client, table_name, df_chunk)
+        chunk_duration = time.monotonic() - start
+        row_count += chunk_row_count
+        insert_duration += chunk_duration
+        logging.debug(
+            f"************ {chunk_row_count} records have been added to the "
+            f"{table_name} table ({chunk_row_count / max(chunk_duration, 1e-6):.0f} "
+            f"rows/s)"
+        )
+    logging.info(
+        f"************ {row_count} records have been inserted into the {table_name} "
+        f"table in {insert_duration:.1f}s "
+        f"({row_count / max(insert_duration, 1e-6):.0f} rows/s)"
+    )
+    return row_count
+
+
+def defer_index(sqlite_client, create_index_func, index_name, table_name, column):
+    sqlite_client.defer_index(
+        index_name, create_index_func(index_name, table_name, column)
+    )
+
+
 def create_and_fill_table_model(
     table_name,
     create_table_query,
@@ -40,12 +103,12 @@ def create_and_fill_table_model(
     index_column,
     preprocess_table_data,
 ):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(drop_table(table_name))
     sqlite_client.execute(create_table_query)
-    sqlite_client.execute(create_index_func(index_name, table_name, index_column))
+    defer_index(sqlite_client, create_index_func, index_name, table_name, index_column)
     df_table = preprocess_table_data(data_dir=AIRFLOW_ETL_DATA_DIR)
-    df_table.to_sql(table_name, sqlite_client.db_conn, if_exists="append", index=False)
+    load_table(sqlite_client, table_name, [df_table])
     del df_table
     for row in sqlite_client.execute(get_table_count(table_name)):
         logging.info(
@@ -62,10 +125,11 @@ def create_table_model(
     index_name,
     index_column,
 ):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(drop_table(table_name))
     sqlite_client.execute(create_table_query)
-    sqlite_client.execute(create_index_func(index_name, table_name, index_column))
+    # The index is built once the table is loaded, by `commit_and_close_conn`
+    defer_index(sqlite_client, create_index_func, index_name, table_name, index_column)
     return sqlite_client
 
 
@@ -75,7 +139,7 @@ def create_only_index(
     index_name,
     index_column,
 ):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(create_index_func(index_name, table_name, index_column))
     sqlite_client.commit_and_close_conn()
 
@@ -83,6 +147,6 @@ def create_only_index(
 def execute_query(
     query,
 ):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(query)
     sqlite_client.commit_and_close_conn()
@@ -0,0 +1,281 @@
+# The data indexed for each unité légale is aggregated once here, with set-based
+# GROUP BY queries, instead of correlated subqueries run for every siren and every
+# siret by the indexing query `select_fields_to_index`
+
+# Values of a side table for a single row of each siret (or siren): the first
+# one, as returned by a subquery on its indexed column. With MIN(rowid), SQLite
+# takes the other columns from the row with the smallest rowid
+first_row_by_column = """(SELECT {column}, {fields}, MIN(rowid)
+            FROM {table} GROUP BY {column})"""
+
+
+def select_first_row_by(table, column, fields):
+    return first_row_by_column.format(table=table, column=column, fields=fields)
+
+
+create_table_etablissement_index_feed_query = """
+        CREATE TEMP TABLE IF NOT EXISTS etablissement_index_feed
+        (
+            siren TEXT,
+            siret TEXT,
+            etablissement TEXT
+        )
+    """
+
+populate_table_etablissement_index_feed_query = f"""
+        INSERT INTO etablissement_index_feed
+        SELECT siren, siret,
+            json_object(
+                'activite_principale',activite_principale,
+                'activite_principale_registre_metier',
+                activite_principale_registre_metier,
+                'ancien_siege',ancien_siege,
+                'caractere_employeur',caractere_employeur,
+                'cedex',cedex,
+                'cedex_2',cedex_2,
+                'code_pays_etranger',code_pays_etranger,
+                'code_pays_etranger_2',code_pays_etranger_2,
+                'code_postal',code_postal,
+                'commune',commune,
+                'commune_2',commune_2,
+                'complement_adresse',complement_adresse,
+                'complement_adresse_2',complement_adresse_2,
+                'date_creation',date_creation,
+                'date_debut_activite',date_debut_activite,
+                'date_fermeture',date_fermeture,
+                'distribution_speciale',distribution_speciale,
+                'distribution_speciale_2',distribution_speciale_2,
+                'enseigne_1',enseigne_1,
+                'enseigne_2',enseigne_2,
+                'enseigne_3',enseigne_3,
+                'est_siege',est_siege,
+                'etat_administratif',etat_administratif_etablissement,
+                'geo_adresse',geo_adresse,
+                'geo_id',geo_id,
+                'geo_score',geo_score,
+                'indice_repetition',indice_repetition,
+                'indice_repetition_2',indice_repetition_2,
+                'latitude',latitude,
+                'libelle_cedex',libelle_cedex,
+                'libelle_cedex_2',libelle_cedex_2,
+                'libelle_commune',libelle_commune,
+                'libelle_commune_2',libelle_commune_2,
+                'libelle_commune_etranger',libelle_commune_etranger,
+                'libelle_commune_etranger_2',libelle_commune_etranger_2,
+                'libelle_pays_etranger',libelle_pays_etranger,
+                'libelle_pays_etranger_2',libelle_pays_etranger_2,
+                'libelle_voie',libelle_voie,
+                'libelle_voie_2',libelle_voie_2,
+                'liste_finess',liste_finess,
+                'liste_id_bio',liste_id_bio,
+                'liste_idcc',liste_idcc,
+                'liste_rge',liste_rge,
+                'liste_uai',liste_uai,
+                'longitude',longitude,
+                'nom_commercial',nom_commercial,
+                'numero_voie',numero_voie,
+                'numero_voie_2',numero_voie_2,
+                'siren',siren,
+                'siret',siret,
+                'statut_diffusion_etablissement',
+                statut_diffusion_etablissement,
+                'tranche_effectif_salarie',tranche_effectif_salarie,
+                'annee_tranche_effectif_salarie',annee_tranche_effectif_salarie,
+                'date_mise_a_jour_insee',date_mise_a_jour_insee,
+                'type_voie',type_voie,
+                'type_voie_2',type_voie_2,
+                'x',x,
+                'y',y
+            )
+        FROM
+        (
+            SELECT
+            s.activite_principale as activite_principale,
+            s.activite_principale_registre_metier as
+            activite_principale_registre_metier,
+            a.siret IS NOT NULL AS ancien_siege,
+            s.caractere_employeur as caractere_employeur,
+            s.cedex as cedex,
+            s.cedex_2 as cedex_2,
+            s.code_pays_etranger as code_pays_etranger,
+            s.code_pays_etranger_2 as code_pays_etranger_2,
+            s.code_postal as code_postal,
+            s.commune as commune,
+            s.commune_2 as commune_2,
+            s.complement_adresse as complement_adresse,
+            s.complement_adresse_2 as complement_adresse_2,
+            s.date_creation as date_creation,
+            s.date_debut_activite as date_debut_activite,
+            s.date_fermeture_etablissement as date_fermeture,
+            s.distribution_speciale as distribution_speciale,
+            s.distribution_speciale_2 as distribution_speciale_2,
+            s.enseigne_1 as enseigne_1,
+            s.enseigne_2 as enseigne_2,
+            s.enseigne_3 as enseigne_3,
+            s.est_siege as est_siege,
+            s.etat_administratif_etablissement as
+            etat_administratif_etablissement,
+            s.geo_adresse as geo_adresse,
+            s.geo_id as geo_id,
+            s.geo_score as geo_score,
+            s.indice_repetition as indice_repetition,
+            s.indice_repetition_2 as indice_repetition_2,
+            s.latitude as latitude,
+            s.libelle_cedex as libelle_cedex,
+            s.libelle_cedex_2 as libelle_cedex_2,
+            s.libelle_commune as libelle_commune,
+            s.libelle_commune_2 as libelle_commune_2,
+            s.libelle_commune_etranger as libelle_commune_etranger,
+            s.libelle_commune_etranger_2 as libelle_commune_etranger_2,
+            s.libelle_pays_etranger as libelle_pays_etranger,
+            s.libelle_pays_etranger_2 as libelle_pays_etranger_2,
+            s.libelle_voie as libelle_voie,
+            s.libelle_voie_2 as libelle_voie_2,
+            s.longitude as longitude,
+            f.liste_finess as liste_finess,
+            b.liste_id_bio as liste_id_bio,
+            cc.liste_idcc_etablissement as liste_idcc,
+            r.liste_rge as liste_rge,
+            u.liste_uai as liste_uai,
+            s.nom_commercial as nom_commercial,
+            s.numero_voie as numero_voie,
+            s.numero_voie_2 as numero_voie_2,
+            s.siren as siren,
+            s.siret as siret,
+            s.statut_diffusion_etablissement as
+            statut_diffusion_etablissement,
+            s.tranche_effectif_salarie as
+            tranche_effectif_salarie,
+            s.annee_tranche_effectif_salarie as
+            annee_tranche_effectif_salarie,
+            s.date_mise_a_jour_insee as date_mise_a_jour_insee,
+            s.type_voie as type_voie,
+            s.type_voie_2 as type_voie_2,
+            s.x as x,
+            s.y as y
+            FROM etablissement s
+            LEFT JOIN {select_first_row_by("finess", "siret", "liste_finess")} f
+            ON f.siret = s.siret
+            LEFT JOIN {select_first_row_by("agence_bio", "siret", "liste_id_bio")} b
+            ON b.siret = s.siret
+            LEFT JOIN convention_collective cc
+            ON cc.siret = s.siret
+            LEFT JOIN {select_first_row_by("rge", "siret", "liste_rge")} r
+            ON r.siret = s.siret
+            LEFT JOIN {select_first_row_by("uai", "siret", "liste_uai")} u
+            ON u.siret = s.siret
+            LEFT JOIN (SELECT DISTINCT siret FROM ancien_siege) a
+            ON a.siret = s.siret
+        )
+    """
+
+create_table_unite_legale_index_feed_query = """
+        CREATE TABLE IF NOT EXISTS unite_legale_index_feed
+        (
+            siren TEXT PRIMARY KEY,
+            sirets_par_idcc TEXT,
+            liste_idcc_unite_legale TEXT,
+            nombre_etablissements INTEGER,
+            nombre_etablissements_ouverts INTEGER,
+            bilan_financier TEXT,
+            dirigeants_pp TEXT,
+            dirigeants_pm TEXT,
+            beneficiaires_effectifs TEXT,
+            etablissements TEXT
+        ) WITHOUT ROWID
+    """
+
+populate_table_unite_legale_index_feed_query = f"""
+        INSERT INTO unite_legale_index_feed
+        SELECT
+            ul.siren,
+            cc.sirets_par_idcc,
+            cc.liste_idcc_unite_legale,
+            ce.count,
+            ceo.count,
+            CASE
+                WHEN bf.siren IS NOT NULL
+                THEN json_object(
+                    'ca', bf.ca,
+                    'resultat_net', bf.resultat_net,
+                    'date_cloture_exercice', bf.date_cloture_exercice,
+                    'annee_cloture_exercice', bf.annee_cloture_exercice
+                )
+            END,
+            COALESCE(pp.dirigeants_pp, json_array()),
+            COALESCE(pm.dirigeants_pm, json_array()),
+            COALESCE(be.beneficiaires_effectifs, json_array()),
+            COALESCE(e.etablissements, json_array())
+        FROM unite_legale ul
+        LEFT JOIN {select_first_row_by(
+            "convention_collective",
+            "siren",
+            "sirets_par_idcc, liste_idcc_unite_legale",
+        )} cc
+        ON cc.siren = ul.siren
+        LEFT JOIN count_etablissement ce
+        ON ce.siren = ul.siren
+        LEFT JOIN count_etablissement_ouvert ceo
+        ON ceo.siren = ul.siren
+        LEFT JOIN bilan_financier bf
+        ON bf.siren = ul.siren
+        LEFT JOIN
+        (
+            SELECT siren, json_group_array(
+                json_object(
+                    'siren', siren,
+                    'date_mise_a_jour', date_mise_a_jour,
+                    'date_de_naissance', date_de_naissance,
+                    'nom', nom,
+                    'nom_usage', nom_usage,
+                    'prenoms', prenoms,
+                    'nationalite', nationalite,
+                    'role_description', role_description
+                )
+            ) AS dirigeants_pp
+            FROM dirigeant_pp
+            GROUP BY siren
+        ) pp
+        ON pp.siren = ul.siren
+        LEFT JOIN
+        (
+            SELECT siren, json_group_array(
+                json_object(
+                    'siren', siren,
+                    'date_mise_a_jour', date_mise_a_jour,
+                    'denomination', denomination,
+                    'siren_dirigeant', siren_dirigeant,
+                    'role_description', role_description,
+                    'forme_juridique', forme_juridique
+                )
+            ) AS dirigeants_pm
+            FROM dirigeant_pm
+            GROUP BY siren
+        ) pm
+        ON pm.siren = ul.siren
+        LEFT JOIN
+        (
+            SELECT siren, json_group_array(
+                json_object(
+                    'siren', siren,
+                    'date_mise_a_jour', date_mise_a_jour,
+                    'date_de_naissance', date_de_naissance,
+                    'nom', nom,
+                    'nom_usage', nom_usage,
+                    'prenoms', prenoms,
+                    'nationalite', nationalite,
+                    'role_description', role_description
+                )
+            ) AS beneficiaires_effectifs
+            FROM beneficiaire
+            GROUP BY siren
+        ) be
+        ON be.siren = ul.siren
+        LEFT JOIN
+        (
+            SELECT siren, json_group_array(json(etablissement)) AS etablissements
+            FROM etablissement_index_feed
+            GROUP BY siren
+        ) e
+        ON e.siren = ul.siren
+    """
@@ -220,3 +220,48 @@ insert_date_fermeture_unite_legale_query = """
     )
     WHERE unite_legale.etat_administratif_unite_legale = 'C'
 """
+
+# Fields of `format_nom_complet` and `format_slug`, whose values are stored in the
+# unite_legale table for the indexing and the sitemap
+select_nom_complet_and_slug_fields_query = """
+        SELECT
+            ul.siren,
+            ul.nom,
+            ul.nom_usage,
+            ul.nom_raison_sociale,
+            ul.prenom,
+            ul.sigle,
+            (SELECT nom_commercial FROM siege WHERE siren = ul.siren)
+            AS nom_commercial,
+            ul.denomination_usuelle_1,
+            ul.denomination_usuelle_2,
+            ul.denomination_usuelle_3,
+            ul.statut_diffusion_unite_legale
+        FROM unite_legale ul
+    """
+
+add_nom_complet_column_query = """
+        ALTER TABLE unite_legale ADD COLUMN nom_complet TEXT
+    """
+
+add_slug_column_query = """
+        ALTER TABLE unite_legale ADD COLUMN slug TEXT
+    """
+
+create_table_nom_complet_and_slug_query = """
+        CREATE TEMP TABLE IF NOT EXISTS nom_complet_and_slug
+        (
+            siren TEXT PRIMARY KEY,
+            nom_complet TEXT,
+            slug TEXT
+        )
+    """
+
+update_nom_complet_and_slug_query = """
+        UPDATE unite_legale
+        SET (nom_complet, slug) = (
+            SELECT nom_complet, slug
+            FROM nom_complet_and_slug
+            WHERE nom_complet_and_slug.siren = unite_legale.siren
+        )
+    """
@@ -1,20 +1,26 @@
 import logging
 import sqlite3
 
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
 
 # fmt: off
 from dag_datalake_sirene.workflows.data_pipelines.etl.data_fetch_clean.etablissements\
     import (
         preprocess_etablissement_data,
         preprocess_historique_etablissement_data,
+        preprocess_stock_etablissement_data,
     )
 from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.helpers import (
     get_table_count,
     create_index,
     create_table_model,
+    defer_index,
     create_unique_index,
     execute_query,
+    load_table,
 )
 from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.queries.etablissements\
     import (
@@ -53,17 +59,11 @@ def create_etablissement_table():
         index_column="siren",
     )
     # Upload geo data by departement
-    for dep in all_deps:
-        df_dep = preprocess_etablissement_data("stock", dep, None)
-        df_dep.to_sql(
-            "etablissement", sqlite_client.db_conn, if_exists="append", index=False
-        )
-        for row in sqlite_client.execute(get_table_count("etablissement")):
-            logging.debug(
-                f"************ {row} records have been added to the "
-                f"`établissements` table!"
-            )
-    del df_dep
+    load_table(
+        sqlite_client,
+        "etablissement",
+        preprocess_stock_etablissement_data(all_deps, AIRFLOW_ETL_DATA_DIR),
+    )
 
     for count_etablissement in sqlite_client.execute(get_table_count("etablissement")):
         logging.info(
@@ -83,12 +83,7 @@ def create_flux_etablissement_table():
     )
     # Upload flux data
     df_etablissement = preprocess_etablissement_data("flux", None, AIRFLOW_ETL_DATA_DIR)
-    df_etablissement.to_sql(
-        "flux_etablissement",
-        sqlite_client.db_conn,
-        if_exists="append",
-        index=False,
-    )
+    load_table(sqlite_client, "flux_etablissement", [df_etablissement])
     del df_etablissement
     for row in sqlite_client.execute(get_table_count("flux_etablissement")):
         logging.info(
@@ -106,7 +101,7 @@ def create_siege_table(**kwargs):
         index_name="index_siege_siren",
         index_column="siren",
     )
-    sqlite_client.execute(create_index("index_siege_siege", "siege", "siret"))
+    defer_index(sqlite_client, create_index, "index_siege_siege", "siege", "siret")
     sqlite_client.execute(populate_table_siege_query)
     for count_siege in sqlite_client.execute(get_table_count("siege")):
         logging.info(
@@ -156,7 +151,7 @@ def count_nombre_etablissement_ouvert():
 
 def add_rne_data_to_siege_table(**kwargs):
     # Connect to the first database
-    sqlite_client_siren = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client_siren = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
 
     # Attach the RNE database
     sqlite_client_siren.connect_to_another_db(RNE_DATABASE_LOCATION, "db_rne")
@@ -195,19 +190,11 @@ def create_historique_etablissement_table(**kwargs):
         index_column="siret",
     )
 
-    for df_hist_etablissement in preprocess_historique_etablissement_data(
-        AIRFLOW_ETL_DATA_DIR,
-    ):
-        df_hist_etablissement.to_sql(
-            table_name, sqlite_client.db_conn, if_exists="append", index=False
-        )
-        for row in sqlite_client.execute(get_table_count(table_name)):
-            logging.debug(
-                f"************ {row} total records have been added "
-                f"to the {table_name} table!"
-            )
-
-    del df_hist_etablissement
+    load_table(
+        sqlite_client,
+        table_name,
+        preprocess_historique_etablissement_data(AIRFLOW_ETL_DATA_DIR),
+    )
 
     for count_etablissement in sqlite_client.execute(get_table_count(table_name)):
         logging.info(
@@ -242,7 +229,7 @@ def create_date_fermeture_etablissement_table(**kwargs):
 
 
 def insert_date_fermeture_etablissement(**kwargs):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(insert_date_fermeture_etablissement_query)
     sqlite_client.execute(insert_date_fermeture_siege_query)
     sqlite_client.commit_and_close_conn()
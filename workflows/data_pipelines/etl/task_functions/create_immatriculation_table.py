@@ -2,12 +2,15 @@ from dag_datalake_sirene.config import (
     SIRENE_DATABASE_LOCATION,
     RNE_DATABASE_LOCATION,
 )
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
 
 
 def create_immatriculation_table():
     # Connect to the destination database
-    sqlite_client_siren = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client_siren = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
 
     # Attach the RNE database
     sqlite_client_siren.connect_to_another_db(RNE_DATABASE_LOCATION, "db_rne")
@@ -0,0 +1,47 @@
+import logging
+
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
+from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.helpers import (
+    create_index,
+    drop_table,
+    get_table_count,
+)
+from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.queries.index_feed import (
+    create_table_etablissement_index_feed_query,
+    create_table_unite_legale_index_feed_query,
+    populate_table_etablissement_index_feed_query,
+    populate_table_unite_legale_index_feed_query,
+)
+from dag_datalake_sirene.config import SIRENE_DATABASE_LOCATION
+
+
+def create_unite_legale_index_feed_table(**kwargs):
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
+
+    # Établissements with their data from the other tables, in a temporary table
+    # which is not part of the uploaded database
+    sqlite_client.execute(create_table_etablissement_index_feed_query)
+    sqlite_client.execute(populate_table_etablissement_index_feed_query)
+    sqlite_client.execute(
+        create_index(
+            "index_etablissement_index_feed", "etablissement_index_feed", "siren"
+        )
+    )
+
+    sqlite_client.execute(drop_table("unite_legale_index_feed"))
+    sqlite_client.execute(create_table_unite_legale_index_feed_query)
+    sqlite_client.execute(populate_table_unite_legale_index_feed_query)
+    for count_unite_legale in sqlite_client.execute(
+        get_table_count("unite_legale_index_feed")
+    ):
+        logging.info(
+            f"************ {count_unite_legale} total records have been added to the "
+            f"unite_legale_index_feed table!"
+        )
+    sqlite_client.commit_and_close_conn()
+    kwargs["ti"].xcom_push(
+        key="count_unite_legale_index_feed", value=count_unite_legale[0]
+    )
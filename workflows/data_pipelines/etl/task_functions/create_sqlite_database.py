@@ -3,7 +3,10 @@ import os
 import shutil
 
 
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
 
 from dag_datalake_sirene.config import (
     AIRFLOW_ETL_DATA_DIR,
@@ -22,5 +25,5 @@ def create_sqlite_database():
             f"{SIRENE_DATABASE_LOCATION}"
         )
     logging.info("******************* Creating database! *******************")
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.commit_and_close_conn()
@@ -1,6 +1,10 @@
 import logging
 import sqlite3
-from dag_datalake_sirene.helpers.sqlite_client import SqliteClient
+import pandas as pd
+from dag_datalake_sirene.helpers.sqlite_client import (
+    SQLITE_BUILD_MODE,
+    SqliteClient,
+)
 
 # fmt: off
 from dag_datalake_sirene.workflows.data_pipelines.etl.data_fetch_clean.unite_legale\
@@ -9,6 +13,11 @@ from dag_datalake_sirene.workflows.data_pipelines.etl.data_fetch_clean.unite_leg
     preprocess_unite_legale_data,
     process_ancien_siege_flux,
 )
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.data_enrichment\
+    import (
+    format_nom_complet_column,
+    format_slug_column,
+)
 from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.queries.unite_legale\
     import (
     create_table_date_fermeture_unite_legale_query,
@@ -21,14 +30,23 @@ from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.queries.unite_legal
     replace_table_unite_legale_query,
     insert_remaining_rne_data_into_main_table_query,
     update_main_table_fields_with_rne_data_query,
+    add_nom_complet_column_query,
+    add_slug_column_query,
+    create_table_nom_complet_and_slug_query,
+    select_nom_complet_and_slug_fields_query,
+    update_nom_complet_and_slug_query,
 )
 # fmt: on
 from dag_datalake_sirene.workflows.data_pipelines.etl.sqlite.helpers import (
     create_index,
     create_table_model,
     create_unique_index,
+    defer_index,
+    drop_table,
     execute_query,
     get_table_count,
+    insert_dataframe,
+    load_table,
 )
 from dag_datalake_sirene.config import AIRFLOW_ETL_DATA_DIR
 from dag_datalake_sirene.config import (
@@ -36,6 +54,8 @@ from dag_datalake_sirene.config import (
     RNE_DATABASE_LOCATION,
 )
 
+NOM_COMPLET_AND_SLUG_CHUNK_SIZE = 100000
+
 
 def create_table(query, table_name, index, sirene_file_type):
     sqlite_client = create_table_model(
@@ -45,19 +65,11 @@ def create_table(query, table_name, index, sirene_file_type):
         index_name=index,
         index_column="siren",
     )
-    for df_unite_legale in preprocess_unite_legale_data(
-        AIRFLOW_ETL_DATA_DIR, sirene_file_type
-    ):
-        df_unite_legale.to_sql(
-            table_name, sqlite_client.db_conn, if_exists="append", index=False
-        )
-        for row in sqlite_client.execute(get_table_count(table_name)):
-            logging.debug(
-                f"************ {row} total records have been added "
-                f"to the {table_name} table!"
-            )
-
-    del df_unite_legale
+    load_table(
+        sqlite_client,
+        table_name,
+        preprocess_unite_legale_data(AIRFLOW_ETL_DATA_DIR, sirene_file_type),
+    )
 
     for count_unite_legale in sqlite_client.execute(get_table_count(table_name)):
         logging.info(
@@ -89,20 +101,13 @@ def create_flux_unite_legale_table(**kwargs):
 
 
 def add_ancien_siege_flux_data(**kwargs):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
 
     table_name = "ancien_siege"
 
-    for df_unite_legale in process_ancien_siege_flux(AIRFLOW_ETL_DATA_DIR):
-        df_unite_legale.to_sql(
-            table_name, sqlite_client.db_conn, if_exists="append", index=False
-        )
-        for row in sqlite_client.execute(get_table_count(table_name)):
-            logging.info(
-                f"************ {row} total records have been added "
-                f"to the {table_name} table!"
-            )
-    del df_unite_legale
+    load_table(
+        sqlite_client, table_name, process_ancien_siege_flux(AIRFLOW_ETL_DATA_DIR)
+    )
     sqlite_client.execute(delete_current_siege_from_ancien_siege_query)
     for row in sqlite_client.execute(get_table_count(table_name)):
         logging.info(
@@ -122,7 +127,9 @@ def add_rne_data_to_unite_legale_table(**kwargs):
 
     try:
         # Connect to the main database (SIRENE)
-        sqlite_client_siren = SqliteClient(SIRENE_DATABASE_LOCATION)
+        sqlite_client_siren = SqliteClient(
+            SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE
+        )
 
         # Attach the RNE database
         sqlite_client_siren.connect_to_another_db(RNE_DATABASE_LOCATION, "db_rne")
@@ -149,17 +156,56 @@ def add_rne_data_to_unite_legale_table(**kwargs):
         raise e
 
 
-def create_historique_unite_legale_tables(**kwargs):
-
-    sqlite_client = create_table_model(
-        table_name="ancien_siege",
-        create_table_query=create_table_ancien_siege_query,
-        create_index_func=create_index,
-        index_name="index_ancien_siege",
-        index_column="siret",
+def add_nom_complet_and_slug_to_unite_legale_table(**kwargs):
+    """Compute the nom complet and the slug of every unité légale once, column by
+    column, so that neither the indexing nor the sitemap compute them again."""
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
+    columns = [
+        column[1] for column in sqlite_client.execute("PRAGMA table_info(unite_legale)")
+    ]
+    if "nom_complet" not in columns:
+        sqlite_client.execute(add_nom_complet_column_query)
+    if "slug" not in columns:
+        sqlite_client.execute(add_slug_column_query)
+    sqlite_client.execute(create_table_nom_complet_and_slug_query)
+
+    load_table(
+        sqlite_client,
+        "nom_complet_and_slug",
+        get_nom_complet_and_slug_chunks(sqlite_client),
     )
+    sqlite_client.execute(update_nom_complet_and_slug_query)
+    logging.info("************ Nom complet and slug added to the unite_legale table!")
     sqlite_client.commit_and_close_conn()
 
+
+def get_nom_complet_and_slug_chunks(sqlite_client):
+    for df_unite_legale in pd.read_sql(
+        select_nom_complet_and_slug_fields_query,
+        sqlite_client.db_conn,
+        chunksize=NOM_COMPLET_AND_SLUG_CHUNK_SIZE,
+    ):
+        df_unite_legale["nom_complet"] = format_nom_complet_column(
+            df_unite_legale["nom"],
+            df_unite_legale["nom_usage"],
+            df_unite_legale["nom_raison_sociale"],
+            df_unite_legale["prenom"],
+        )
+        df_unite_legale["slug"] = format_slug_column(
+            df_unite_legale["nom_complet"],
+            df_unite_legale["sigle"],
+            df_unite_legale["nom_commercial"],
+            df_unite_legale["denomination_usuelle_1"],
+            df_unite_legale["denomination_usuelle_2"],
+            df_unite_legale["denomination_usuelle_3"],
+            df_unite_legale["siren"],
+            df_unite_legale["statut_diffusion_unite_legale"],
+        )
+        yield df_unite_legale[["siren", "nom_complet", "slug"]]
+
+
+def create_historique_unite_legale_tables(**kwargs):
+
     table_name = "historique_unite_legale"
     sqlite_client = create_table_model(
         table_name=table_name,
@@ -168,6 +214,12 @@ def create_historique_unite_legale_tables(**kwargs):
         index_name="index_historique_siren",
         index_column="siren",
     )
+    # ancien_siege is loaded along with historique_unite_legale
+    sqlite_client.execute(drop_table("ancien_siege"))
+    sqlite_client.execute(create_table_ancien_siege_query)
+    defer_index(
+        sqlite_client, create_index, "index_ancien_siege", "ancien_siege", "siret"
+    )
 
     for (
         df_hist_unite_legale,
@@ -175,27 +227,8 @@ def create_historique_unite_legale_tables(**kwargs):
     ) in preprocess_historique_unite_legale_data(
         AIRFLOW_ETL_DATA_DIR,
     ):
-        df_hist_unite_legale.to_sql(
-            table_name, sqlite_client.db_conn, if_exists="append", index=False
-        )
-
-        df_ancien_siege.to_sql(
-            "ancien_siege",
-            sqlite_client.db_conn,
-            if_exists="append",
-            index=False,
-        )
-
-        for row in sqlite_client.execute(get_table_count(table_name)):
-            logging.debug(
-                f"************ {row} total records have been added "
-                f"to the {table_name} table!"
-            )
-        for row in sqlite_client.execute(get_table_count("ancien_siege")):
-            logging.debug(
-                f"************ {row} total records have been added "
-                f"to the ancien_siege table!"
-            )
+        insert_dataframe(sqlite_client, table_name, df_hist_unite_legale)
+        insert_dataframe(sqlite_client, "ancien_siege", df_ancien_siege)
 
     del df_hist_unite_legale
 
@@ -232,6 +265,6 @@ def create_date_fermeture_unite_legale_table(**kwargs):
 
 
 def insert_date_fermeture_unite_legale(**kwargs):
-    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION)
+    sqlite_client = SqliteClient(SIRENE_DATABASE_LOCATION, mode=SQLITE_BUILD_MODE)
     sqlite_client.execute(insert_date_fermeture_unite_legale_query)
     sqlite_client.commit_and_close_conn()
@@ -1,4 +1,3 @@
-import requests
 import logging
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
 from dag_datalake_sirene.config import (
@@ -7,18 +6,20 @@ from dag_datalake_sirene.config import (
     URL_ETABLISSEMENTS_HISTORIQUE,
 )
 from dag_datalake_sirene.helpers.tchap import send_message
+from dag_datalake_sirene.helpers.utils import download_file
 
 
 def download_stock_etab():
     logging.info(f"Downloading Etablissements stock: {URL_ETABLISSEMENTS}")
-    r = requests.get(URL_ETABLISSEMENTS, allow_redirects=True)
-    open(f"{INSEE_TMP_FOLDER}etab/StockEtablissement_utf8.zip", "wb").write(r.content)
+    download_file(
+        URL_ETABLISSEMENTS, f"{INSEE_TMP_FOLDER}etab/StockEtablissement_utf8.zip"
+    )
 
 
 def download_historique_etab():
-    r = requests.get(URL_ETABLISSEMENTS_HISTORIQUE, allow_redirects=True)
-    open(f"{INSEE_TMP_FOLDER}etab/StockEtablissementHistorique_utf8.zip", "wb").write(
-        r.content
+    download_file(
+        URL_ETABLISSEMENTS_HISTORIQUE,
+        f"{INSEE_TMP_FOLDER}etab/StockEtablissementHistorique_utf8.zip",
     )
 
 
@@ -1,5 +1,3 @@
-import requests
-
 from dag_datalake_sirene.helpers.minio_helpers import minio_client
 from dag_datalake_sirene.config import (
     INSEE_TMP_FOLDER,
@@ -7,17 +5,17 @@ from dag_datalake_sirene.config import (
     URL_UNITE_LEGALE_HISTORIQUE,
 )
 from dag_datalake_sirene.helpers.tchap import send_message
+from dag_datalake_sirene.helpers.utils import download_file
 
 
 def download_stock_ul():
-    r = requests.get(URL_UNITE_LEGALE, allow_redirects=True)
-    open(f"{INSEE_TMP_FOLDER}ul/StockUniteLegale_utf8.zip", "wb").write(r.content)
+    download_file(URL_UNITE_LEGALE, f"{INSEE_TMP_FOLDER}ul/StockUniteLegale_utf8.zip")
 
 
 def download_historique_ul():
-    r = requests.get(URL_UNITE_LEGALE_HISTORIQUE, allow_redirects=True)
-    open(f"{INSEE_TMP_FOLDER}ul/StockUniteLegaleHistorique_utf8.zip", "wb").write(
-        r.content
+    download_file(
+        URL_UNITE_LEGALE_HISTORIQUE,
+        f"{INSEE_TMP_FOLDER}ul/StockUniteLegaleHistorique_utf8.zip",
     )
 
 
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from airflow.models import DAG
+from airflow.operators.python import PythonOperator
+
+# fmt: off
+from dag_datalake_sirene.workflows.data_pipelines.elasticsearch.task_functions.\
+    index import audit_elastic_index_fields
+# fmt: on
+from dag_datalake_sirene.config import EMAIL_LIST
+
+DAG_NAME = "audit_index_fields"
+
+default_args = {
+    "depends_on_past": False,
+    "email": EMAIL_LIST,
+    "email_on_failure": True,
+    "email_on_retry": False,
+    "retries": 0,
+}
+
+# This DAG reports the disk usage and the number of searches of each field of the
+# live siren index, to find the fields which could be excluded from the inverted
+# index, the doc values or the norms
+with DAG(
+    dag_id=DAG_NAME,
+    default_args=default_args,
+    schedule_interval="0 6 * * 1",  # every monday at 6:00 AM (UTC)
+    start_date=datetime(2024, 1, 1),
+    dagrun_timeout=timedelta(minutes=90),
+    tags=["maintenance", "elasticsearch"],
+    catchup=False,
+    max_active_runs=1,
+) as dag:
+    audit_elastic_index_fields = PythonOperator(
+        task_id="audit_elastic_index_fields",
+        provide_context=True,
+        python_callable=audit_elastic_index_fields,
+    )